@@ -1 +1,6 @@
-# FastAPI Research Assistant API Package
\ No newline at end of file
+# FastAPI Research Assistant API Package
+
+from dotenv import load_dotenv
+
+# Load environment variables once for all API modules
+load_dotenv()
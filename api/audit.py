@@ -3,18 +3,48 @@ Audit logging system for the Research Assistant API.
 File-based audit logging with structured format.
 """
 
-import json
+import asyncio
+import atexit
+import hashlib
+import mmap
 import os
+import re
+import struct
+from collections import deque
+from contextlib import suppress
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, Any
 from enum import Enum
-from dotenv import load_dotenv
 
-from pydantic import BaseModel
+import msgspec
+import orjson
 
-# Load environment variables
-load_dotenv()
+# Buffering configuration
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "512"))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "100"))
+
+# On-disk format of the global daily log: "jsonl" or "msgpack"
+AUDIT_LOG_FORMAT = os.getenv("AUDIT_LOG_FORMAT", "jsonl").lower()
+LOG_FORMAT_SUFFIXES = {"jsonl": ".log", "msgpack": ".msgpack"}
+
+# Binary record header: marker, then payload length as little-endian uint32
+RECORD_MARKER = b"\xa7\x1d"
+RECORD_HEADER = struct.Struct("<2sI")
+
+# Usernames that can be used verbatim as a per-user file or directory name. Lowercase
+# only, so case-insensitive file systems cannot merge two users, and never starting
+# with "_", which marks hashed names
+SAFE_STORAGE_NAME = re.compile(r"^[a-z0-9-][a-z0-9_.-]{0,63}$")
+
+
+def user_storage_name(username: str) -> str:
+    """Map a username to a file name that no other username maps to."""
+    # Arbitrary usernames must never shape a path; those that could are hashed
+    if SAFE_STORAGE_NAME.match(username):
+        return username
+    return "_" + hashlib.sha256(username.encode("utf-8")).hexdigest()[:32]
 
 
 class AuditAction(str, Enum):
@@ -44,8 +74,8 @@ class AuditLevel(str, Enum):
     CRITICAL = "critical"
 
 
-class AuditEntry(BaseModel):
-    """Audit log entry model."""
+class AuditEntry(msgspec.Struct, kw_only=True):
+    """Audit log entry (schema of a stored log line)."""
     timestamp: str
     level: AuditLevel
     action: AuditAction
@@ -57,33 +87,224 @@ class AuditEntry(BaseModel):
     duration_ms: Optional[int] = None
 
 
+# Binary records store entry values positionally in this order
+AUDIT_FIELDS = AuditEntry.__struct_fields__
+
+
 class AuditLogger:
-    """File-based audit logger."""
+    """
+    File-based audit logger.
+    
+    Entries are serialized on the caller's side and appended to an in-memory
+    ring buffer; a background task started with ``start()`` drains the buffer
+    in batches with one write per log file. Without a running flusher every
+    entry is written through immediately.
+    
+    Entries of registered users are also appended to ``by_user/<name>/``
+    (see ``user_storage_name``) so per-user reads only touch that user's
+    lines. Entries for unknown or anonymous usernames, such as failed
+    logins, only go to the global daily files, which remain the complete
+    log. Per-user files are complete from the time in ``by_user/.since``;
+    a user's older entries are read by filtering the global files, which
+    stops once the requested days are all past that time.
     
-    def __init__(self, log_dir: str = None):
+    With the ``msgpack`` log format the global files hold binary records
+    instead of JSON lines: a ``RECORD_HEADER`` (marker and payload length)
+    followed by the entry's values as a msgpack array in ``AUDIT_FIELDS``
+    order. Readers find the records with a forward scan of the headers and
+    resume at the next marker after a torn or corrupt record, so one bad
+    write only loses that record. Per-user files are always JSON lines,
+    since they are served to API clients as-is.
+    """
+    
+    def __init__(self, log_dir: str = None, buffer_size: int = None, log_format: str = None):
         # Use environment variable or default
         log_dir = log_dir or os.getenv("AUDIT_LOG_DIR", "data/audit")
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.log_format = log_format or AUDIT_LOG_FORMAT
+        if self.log_format not in LOG_FORMAT_SUFFIXES:
+            print(f"WARNING: Unknown audit log format '{self.log_format}', using jsonl")
+            self.log_format = "jsonl"
+        
+        # Ring buffer of (date, username, JSON line, binary record or None); oldest entries are dropped on overflow
+        self._buffer: deque = deque(maxlen=buffer_size or AUDIT_BUFFER_SIZE)
+        self._user_dirs: set = set()
+        self.dropped_entries = 0
+        
+        # Background flusher state
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        
+        # Append descriptor of the current day's log file, reopened on date change
+        self._current_fd: Optional[int] = None
+        self._current_date = None
+        
+        # Start of the per-user files; None if no global log predates them
+        self._per_user_since = self._load_per_user_since()
+    
+    def _load_per_user_since(self) -> Optional[datetime]:
+        """Read the time per-user files start from, recording it on first use."""
+        marker = self.log_dir / "by_user" / ".since"
+        marker.parent.mkdir(exist_ok=True)
+        
+        # Only entries of global logs that already exist need the fallback
+        since = datetime.now().isoformat() if any(self.log_dir.glob("audit_*")) else ""
+        
+        # Link a complete temp file into place, so concurrent workers agree on one
+        # time and never read a half-written marker
+        tmp_file = marker.with_name(f".since.{os.getpid()}.{id(self)}.tmp")
+        tmp_file.write_text(since)
+        try:
+            os.link(tmp_file, marker)
+        except FileExistsError:
+            since = marker.read_text().strip()
+        finally:
+            tmp_file.unlink()
+        
+        return datetime.fromisoformat(since) if since else None
     
     def _get_log_file(self, date: datetime = None) -> Path:
         """Get log file path for date."""
         if date is None:
             date = datetime.now()
         
-        filename = f"audit_{date.strftime('%Y%m%d')}.log"
+        filename = f"audit_{date.strftime('%Y%m%d')}{LOG_FORMAT_SUFFIXES[self.log_format]}"
         return self.log_dir / filename
     
-    def _write_entry(self, entry: AuditEntry):
-        """Write audit entry to file."""
-        log_file = self._get_log_file()
+    def _get_user_log_file(self, username: str, date: datetime = None) -> Path:
+        """Get the per-user log file path for date."""
+        if date is None:
+            date = datetime.now()
+        
+        dirname = user_storage_name(username)
+        return self.log_dir / "by_user" / dirname / f"audit_{date.strftime('%Y%m%d')}.log"
+    
+    def _write_entry(self, date, username: Optional[str], entry: Dict[str, Any]):
+        """Serialize and queue an audit entry for the log files of ``date``; without a username only the global log gets it."""
+        log_line = orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+        record = self._to_record(entry) if self.log_format == "msgpack" else None
         
-        # Convert to JSON string
-        log_line = entry.json() + "\n"
+        if len(self._buffer) == self._buffer.maxlen:
+            # deque drops the oldest entry on append
+            self.dropped_entries += 1
+        self._buffer.append((date, username, log_line, record))
         
-        # Append to file
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(log_line)
+        if self._flusher_task is None:
+            self.flush()
+        elif len(self._buffer) >= AUDIT_FLUSH_BATCH:
+            self._wakeup.set()
+    
+    def flush(self):
+        """Write all buffered entries to disk, one write per batch."""
+        while self._buffer:
+            self._flush_batch()
+    
+    def _flush_batch(self) -> int:
+        """Write up to one batch of same-day entries and return how many were written."""
+        buffer = self._buffer
+        if not buffer:
+            return 0
+        
+        day = buffer[0][0]
+        batch = []
+        by_user: Dict[str, list] = {}
+        while buffer and len(batch) < AUDIT_FLUSH_BATCH and buffer[0][0] == day:
+            _, username, line, record = buffer.popleft()
+            batch.append(line if record is None else record)
+            if username:
+                by_user.setdefault(username, []).append(line)
+        
+        self._append(day, b"".join(batch))
+        
+        for username, lines in by_user.items():
+            user_file = self._get_user_log_file(username, day)
+            if user_file.parent not in self._user_dirs:
+                user_file.parent.mkdir(parents=True, exist_ok=True)
+                self._user_dirs.add(user_file.parent)
+            with open(user_file, 'ab') as f:
+                f.write(b"".join(lines))
+        
+        return len(batch)
+    
+    def _to_record(self, entry: Dict[str, Any]) -> bytes:
+        """Encode an audit entry as a binary log record."""
+        # msgspec writes naive datetimes and str enums exactly as orjson does
+        payload = msgspec.msgpack.encode([entry[field] for field in AUDIT_FIELDS])
+        return RECORD_HEADER.pack(RECORD_MARKER, len(payload)) + payload
+    
+    def _append(self, date, data: bytes):
+        """Append bytes to the log file of ``date`` through the cached descriptor."""
+        if date != self._current_date:
+            self.close()
+            self._current_fd = os.open(
+                self._get_log_file(date),
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o640
+            )
+            self._current_date = date
+        
+        view = memoryview(data)
+        while view:
+            written = os.write(self._current_fd, view)
+            view = view[written:]
+    
+    def _flush_at_exit(self):
+        """Write entries still buffered when the process exits without a clean shutdown."""
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"WARNING: Failed to flush audit log at exit: {e}")
+        finally:
+            self.close()
+    
+    def close(self):
+        """Close the cached log file descriptor."""
+        fd, self._current_fd = self._current_fd, None
+        self._current_date = None
+        if fd is not None:
+            os.close(fd)
+    
+    async def _flusher(self):
+        """
+        Drain the buffer one batch at a time.
+        
+        While full batches are waiting the flusher only yields to the event
+        loop between writes; once the buffer falls below a batch it sleeps
+        until a batch fills up or the flush interval passes.
+        """
+        interval = AUDIT_FLUSH_INTERVAL_MS / 1000
+        while True:
+            if len(self._buffer) < AUDIT_FLUSH_BATCH:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+                self._wakeup.clear()
+            else:
+                await asyncio.sleep(0)
+            try:
+                self._flush_batch()
+            except OSError as e:
+                print(f"WARNING: Failed to flush audit log: {e}")
+    
+    async def start(self):
+        """Start the background flusher on the running event loop."""
+        if self._flusher_task is None:
+            self._wakeup = asyncio.Event()
+            self._flusher_task = asyncio.create_task(self._flusher())
+            # Entries are only held back while the flusher runs
+            atexit.register(self._flush_at_exit)
+    
+    async def stop(self):
+        """Stop the background flusher and write any remaining entries."""
+        task, self._flusher_task = self._flusher_task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            atexit.unregister(self._flush_at_exit)
+        self.flush()
+        self.close()
     
     def log(
         self,
@@ -94,22 +315,27 @@ class AuditLogger:
         user_agent: Optional[str] = None,
         details: Optional[Dict[str, Any]] = None,
         request_id: Optional[str] = None,
-        duration_ms: Optional[int] = None
+        duration_ms: Optional[int] = None,
+        per_user: bool = True
     ):
-        """Log audit entry."""
-        entry = AuditEntry(
-            timestamp=datetime.now().isoformat(),
-            level=level,
-            action=action,
-            username=username,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            details=details or {},
-            request_id=request_id,
-            duration_ms=duration_ms
-        )
+        """Log audit entry; ``per_user=False`` keeps it out of the user's own log (e.g. unknown users)."""
+        now = datetime.now()
+        
+        # Same shape as AuditEntry; orjson serializes the datetime and enums natively
+        entry = {
+            "timestamp": now,
+            "level": level,
+            "action": action,
+            "username": username,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "details": details or {},
+            "request_id": request_id,
+            "duration_ms": duration_ms
+        }
         
-        self._write_entry(entry)
+        # Bucket by the entry's own date so buffered entries never cross midnight
+        self._write_entry(now.date(), username if per_user else None, entry)
     
     def log_auth_success(self, username: str, ip_address: str, user_agent: str):
         """Log successful authentication."""
@@ -122,15 +348,23 @@ class AuditLogger:
             details={"status": "success"}
         )
     
-    def log_auth_failure(self, username: str, ip_address: str, user_agent: str, reason: str):
-        """Log failed authentication."""
+    def log_auth_failure(
+        self,
+        username: str,
+        ip_address: str,
+        user_agent: str,
+        reason: str,
+        user_exists: bool = True
+    ):
+        """Log failed authentication; attempts on unknown usernames only go to the global log."""
         self.log(
             action=AuditAction.LOGIN_FAILED,
             level=AuditLevel.WARNING,
             username=username,
             ip_address=ip_address,
             user_agent=user_agent,
-            details={"status": "failed", "reason": reason}
+            details={"status": "failed", "reason": reason},
+            per_user=user_exists
         )
     
     def log_user_registration(self, username: str, email: str, ip_address: str):
@@ -207,47 +441,233 @@ class AuditLogger:
         ip_address: str,
         user_agent: str,
         status_code: int,
-        duration_ms: int
+        duration_ms: int,
+        per_user: bool = True
     ):
-        """Log API access."""
-        level = AuditLevel.INFO if status_code < 400 else AuditLevel.WARNING
-        
-        self.log(
-            action=AuditAction.API_ACCESS,
-            level=level,
-            username=username,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            duration_ms=duration_ms,
-            details={
+        """Log API access; anonymous requests pass ``per_user=False``."""
+        # Runs once per request from the middleware: build the fixed-shape
+        # entry directly instead of going through log()
+        now = datetime.now()
+        entry = {
+            "timestamp": now,
+            "level": AuditLevel.INFO if status_code < 400 else AuditLevel.WARNING,
+            "action": AuditAction.API_ACCESS,
+            "username": username,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "details": {
                 "method": method,
                 "endpoint": endpoint,
                 "status_code": status_code
-            }
-        )
+            },
+            "request_id": None,
+            "duration_ms": duration_ms
+        }
+        
+        self._write_entry(now.date(), username if per_user else None, entry)
     
-    def get_recent_logs(self, days: int = 7, username: Optional[str] = None) -> list:
-        """Get recent audit logs."""
-        logs = []
+    def _read_lines_reversed(self, log_file: Path, chunk_size: int = 65536):
+        """Yield the lines of a log file from last to first, reading it in chunks."""
+        with open(log_file, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b""
+            
+            while position > 0:
+                read_size = min(chunk_size, position)
+                position -= read_size
+                f.seek(position)
+                lines = (f.read(read_size) + remainder).split(b"\n")
+                
+                # The first piece may be the tail of a line that starts in an earlier chunk
+                remainder = lines[0]
+                for line in reversed(lines[1:]):
+                    if line:
+                        yield line
+            
+            if remainder:
+                yield remainder
+    
+    @staticmethod
+    def _decode_record(payload) -> list:
+        """Decode a binary record payload into its entry values; raises ValueError."""
+        values = msgspec.msgpack.decode(payload)
+        if not isinstance(values, list) or len(values) != len(AUDIT_FIELDS):
+            raise ValueError("Not an audit record")
+        return values
+    
+    def _record_spans(self, data, log_file: Path) -> list:
+        """Scan a binary log forward and return the (start, end) payload span of each record."""
+        spans = []
+        size = len(data)
+        offset = 0
+        checking = False
+        warned = False
         
-        for i in range(days):
-            date = datetime.now() - timedelta(days=i)
-            log_file = self._get_log_file(date)
+        while offset + RECORD_HEADER.size <= size:
+            marker, length = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            end = start + length
             
-            if not log_file.exists():
-                continue
+            if marker == RECORD_MARKER and end <= size:
+                if checking:
+                    # Near damage a marker may also be payload bytes; only a decodable record counts
+                    try:
+                        self._decode_record(data[start:end])
+                        sound = True
+                    except ValueError:
+                        sound = False
+                else:
+                    # A sound record ends where the next one starts
+                    sound = end == size or data[end:end + 2] == RECORD_MARKER
+                
+                if sound:
+                    spans.append((start, end))
+                    offset = end
+                    checking = False
+                    continue
+                if not checking:
+                    # The damage may be in what follows; check this record on its own first
+                    checking = True
+                    continue
             
-            with open(log_file, 'r', encoding='utf-8') as f:
-                for line in f:
+            # Torn or corrupt record, e.g. from a crash mid-write: resume at the next marker
+            if not warned:
+                print(f"WARNING: Skipping damaged audit records in {log_file}")
+                warned = True
+            checking = True
+            offset = data.find(RECORD_MARKER, offset + 1)
+            if offset < 0:
+                break
+        
+        return spans
+    
+    def _read_records_reversed(self, log_file: Path):
+        """Yield the binary records of a log file from last to first as JSON bytes."""
+        with open(log_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for start, end in reversed(self._record_spans(data, log_file)):
                     try:
-                        entry = json.loads(line.strip())
-                        if username is None or entry.get('username') == username:
-                            logs.append(entry)
-                    except json.JSONDecodeError:
+                        values = self._decode_record(data[start:end])
+                    except ValueError:
+                        print(f"WARNING: Skipping undecodable audit record at byte {start} of {log_file}")
                         continue
+                    yield orjson.dumps(dict(zip(AUDIT_FIELDS, values)))
+    
+    def _count_records(self, log_file: Path) -> int:
+        """Count the records of a binary log file without decoding them."""
+        with open(log_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return len(self._record_spans(data, log_file))
+    
+    def _recent_log_files(self, days: int, username: Optional[str]):
+        """Yield the existing log files of the last ``days`` days, newest first."""
+        for date in self._recent_dates(days):
+            if username is None:
+                log_file = self._get_log_file(date)
+            else:
+                log_file = self._get_user_log_file(username, date)
+            
+            if log_file.exists():
+                yield log_file
+    
+    @staticmethod
+    def _recent_dates(days: int):
+        """Yield the datetimes of the last ``days`` days, today first."""
+        now = datetime.now()
+        for i in range(days):
+            yield now - timedelta(days=i)
+    
+    def _iter_global_lines(self, log_file: Path):
+        """Yield the entries of a global log file from last to first as JSON bytes."""
+        if self.log_format == "msgpack":
+            return self._read_records_reversed(log_file)
+        return self._read_lines_reversed(log_file)
+    
+    def _legacy_user_lines(self, username: str, date: datetime):
+        """Yield a user's entries of ``date`` logged before per-user files existed, newest first."""
+        since = self._per_user_since
+        if since is None or date.date() > since.date():
+            return
+        
+        log_file = self._get_log_file(date)
+        if not log_file.exists():
+            return
+        
+        # Timestamps are ISO strings, which sort like the times they encode
+        since = since.isoformat()
+        for line in self._iter_global_lines(log_file):
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if entry.get("username") == username and entry.get("timestamp", "") < since:
+                yield line
+    
+    def _iter_user_lines(self, username: str, days: int):
+        """Yield a user's recent entries as raw JSON bytes, newest first."""
+        for date in self._recent_dates(days):
+            user_file = self._get_user_log_file(username, date)
+            if user_file.exists():
+                yield from self._read_lines_reversed(user_file)
+            yield from self._legacy_user_lines(username, date)
+    
+    def iter_recent_logs(self, days: int = 7, username: Optional[str] = None):
+        """
+        Iterate recent audit log lines as raw JSON bytes, newest first.
+        
+        Daily files are append-ordered, so reading them today-to-oldest and
+        each file back-to-front yields entries in timestamp order without
+        loading or sorting them. With a username only that user's files are
+        read, plus the global files of days before ``by_user/.since``.
+        Buffered entries are not included; call ``flush()`` first to see
+        them.
+        """
+        if username is not None:
+            yield from self._iter_user_lines(username, days)
+            return
+        
+        for log_file in self._recent_log_files(days, None):
+            yield from self._iter_global_lines(log_file)
+    
+    def count_recent_logs(self, days: int = 7, username: Optional[str] = None) -> int:
+        """Count recent audit log entries without parsing them."""
+        if username is None and self.log_format == "msgpack":
+            return sum(self._count_records(log_file) for log_file in self._recent_log_files(days, None))
+        
+        total = 0
+        for log_file in self._recent_log_files(days, username):
+            with open(log_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    total += chunk.count(b"\n")
+        
+        if username is not None:
+            for date in self._recent_dates(days):
+                total += sum(1 for _ in self._legacy_user_lines(username, date))
+        return total
+    
+    def get_recent_logs(
+        self,
+        days: int = 7,
+        username: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> list:
+        """Get recent audit logs, newest first, stopping after ``limit`` entries."""
+        # Make buffered entries visible to readers
+        self.flush()
+        
+        logs = []
+        for line in self.iter_recent_logs(days=days, username=username):
+            try:
+                logs.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                continue
+            if limit is not None and len(logs) >= limit:
+                break
         
-        # Sort by timestamp (newest first)
-        logs.sort(key=lambda x: x['timestamp'], reverse=True)
         return logs
 
 
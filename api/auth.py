@@ -3,32 +3,93 @@ Local authentication system for the Research Assistant API.
 File-based user management with JWT tokens.
 """
 
-import json
+import asyncio
+import base64
+import hashlib
+import hmac
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from pathlib import Path
 
+import msgspec
+import orjson
+
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from pydantic import BaseModel
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Configuration (loaded from .env file)
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "research-assistant-secret-key-change-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 USERS_FILE = os.getenv("USERS_FILE", "data/users.json")
+USERS_FLUSH_INTERVAL_SECONDS = float(os.getenv("USERS_FLUSH_INTERVAL_SECONDS", "5"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Key bytes for the HS256 verification fast path
+_HS256_KEY = SECRET_KEY.encode("utf-8")
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_hs256(token: str) -> Dict[str, Any]:
+    """
+    Verify an HS256 JWT with the standard library and return its claims.
+    
+    Checks the same things jwt.decode does for the tokens this API issues:
+    header algorithm, signature, and the exp/nbf claims. Raises JWTError.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
+        header = orjson.loads(_b64url_decode(header_b64))
+        signature = _b64url_decode(signature_b64)
+    except (ValueError, orjson.JSONDecodeError):
+        raise JWTError("Malformed token")
+    
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        raise JWTError("The specified alg value is not allowed")
+    
+    expected = hmac.new(_HS256_KEY, signing_input, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise JWTError("Signature verification failed.")
+    
+    try:
+        payload = orjson.loads(_b64url_decode(payload_b64))
+    except (ValueError, orjson.JSONDecodeError):
+        raise JWTError("Invalid payload")
+    if not isinstance(payload, dict):
+        raise JWTError("Invalid payload")
+    
+    now = time.time()
+    try:
+        if "exp" in payload and float(payload["exp"]) < now:
+            raise JWTError("Signature has expired.")
+        if "nbf" in payload and float(payload["nbf"]) > now:
+            raise JWTError("The token is not yet valid (nbf)")
+    except (TypeError, ValueError):
+        raise JWTError("Invalid exp or nbf claim")
+    
+    return payload
+
+
 # Validate JWT secret key
 if SECRET_KEY == "research-assistant-secret-key-change-in-production":
     print("WARNING: Using default JWT secret key. Set JWT_SECRET_KEY in .env file for production.")
@@ -42,8 +103,17 @@ class User(BaseModel):
     disabled: bool = False
 
 
-class UserInDB(User):
-    """User model with hashed password."""
+class UserInDB(msgspec.Struct, kw_only=True):
+    """
+    Stored user record with hashed password.
+    
+    A msgspec struct rather than a pydantic model: the whole users file is
+    decoded into these in one call and they never reach a response directly.
+    """
+    username: str
+    email: str
+    full_name: str
+    disabled: bool = False
     hashed_password: str
     created_at: str
     last_login: Optional[str] = None
@@ -76,33 +146,137 @@ class AuthManager:
     def __init__(self):
         self.users_file = Path(USERS_FILE)
         self.users_file.parent.mkdir(exist_ok=True)
+        
+        # Parsed users, reloaded only when the file changes on disk
+        self._cache: Dict[str, UserInDB] = {}
+        self._cache_key: Optional[Tuple[int, int]] = None
+        self._cache_lock = threading.Lock()
+        
+        # Logins not yet written (username -> last_login) and their background writer;
+        # they are merged into the file on disk, which other workers may have changed
+        self._pending_logins: Dict[str, str] = {}
+        self._flusher_task: Optional[asyncio.Task] = None
+        
+        # Verified tokens: token -> (username, cache expiry epoch), in LRU order
+        self._token_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        
+        # bcrypt is deliberately slow; keep it off the event loop
+        self._hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        
         self._ensure_users_file()
     
     def _ensure_users_file(self):
         """Ensure users file exists."""
-        if not self.users_file.exists():
-            self.users_file.write_text(json.dumps({}))
+        # O_EXCL makes creation atomic, so concurrent workers never truncate it
+        try:
+            fd = os.open(self.users_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o600)
+        except FileExistsError:
+            return
+        try:
+            os.write(fd, b"{}")
+        finally:
+            os.close(fd)
+    
+    def _file_key(self) -> Tuple[int, int]:
+        """Get (mtime_ns, size) of the users file to detect changes."""
+        stat = self.users_file.stat()
+        return stat.st_mtime_ns, stat.st_size
     
     def _load_users(self) -> Dict[str, UserInDB]:
-        """Load users from file."""
+        """Load users, re-reading the file only if it changed since the last load."""
         try:
-            with open(self.users_file, 'r') as f:
-                users_data = json.load(f)
-                return {
-                    username: UserInDB(**user_data)
-                    for username, user_data in users_data.items()
-                }
-        except (FileNotFoundError, json.JSONDecodeError):
+            key = self._file_key()
+        except FileNotFoundError:
             return {}
+        
+        if key == self._cache_key:
+            return self._cache
+        
+        with self._cache_lock:
+            # Another thread may have reloaded while we waited
+            return self._reload_users(key)
+    
+    def _reload_users(self, key: Optional[Tuple[int, int]] = None) -> Dict[str, UserInDB]:
+        """Re-read the users file if it changed since the last load; call with _cache_lock held."""
+        if key is None:
+            try:
+                key = self._file_key()
+            except FileNotFoundError:
+                return {}
+        
+        if key != self._cache_key:
+            try:
+                users = msgspec.json.decode(
+                    self.users_file.read_bytes(),
+                    type=Dict[str, UserInDB]
+                )
+            except (FileNotFoundError, msgspec.DecodeError):
+                return {}
+            
+            # Logins of this process that are not on disk yet
+            for username, last_login in self._pending_logins.items():
+                if username in users:
+                    users[username].last_login = last_login
+            
+            self._cache = users
+            self._cache_key = key
+        
+        return self._cache
+    
+    def _write_users(self, users: Dict[str, UserInDB]):
+        """Write users to file; call with _cache_lock held."""
+        users_data = msgspec.json.format(msgspec.json.encode(users), indent=2)
+        
+        # Write a temp file and rename it so readers never see a partial file
+        tmp_file = self.users_file.with_name(f"{self.users_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(users_data)
+        os.replace(tmp_file, self.users_file)
+        
+        # Our own write must not trigger a reload
+        self._cache = users
+        self._cache_key = self._file_key()
+        self._pending_logins.clear()
+    
+    def _record_login(self, user: UserInDB):
+        """Update a user's last login in memory; the flusher writes it to disk."""
+        user.last_login = datetime.now().isoformat()
+        with self._cache_lock:
+            self._pending_logins[user.username] = user.last_login
+        if self._flusher_task is None:
+            self.flush()
+    
+    def flush(self):
+        """Write pending logins to disk, merged into the current users file."""
+        with self._cache_lock:
+            if self._pending_logins:
+                # Pick up users other workers saved since our last load
+                users = self._reload_users()
+                if users:
+                    self._write_users(users)
+    
+    async def _flusher(self):
+        """Periodically write pending user changes."""
+        while True:
+            await asyncio.sleep(USERS_FLUSH_INTERVAL_SECONDS)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"WARNING: Failed to save users file: {e}")
     
-    def _save_users(self, users: Dict[str, UserInDB]):
-        """Save users to file."""
-        users_data = {
-            username: user.dict()
-            for username, user in users.items()
-        }
-        with open(self.users_file, 'w') as f:
-            json.dump(users_data, f, indent=2)
+    async def start(self):
+        """Start the background users-file writer on the running event loop."""
+        if self._flusher_task is None:
+            self._flusher_task = asyncio.create_task(self._flusher())
+    
+    async def stop(self):
+        """Stop the background writer and save any pending changes."""
+        task, self._flusher_task = self._flusher_task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self.flush()
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify password."""
@@ -112,30 +286,35 @@ class AuthManager:
         """Hash password."""
         return pwd_context.hash(password)
     
+    def count_users(self) -> int:
+        """Get the number of registered users."""
+        return len(self._load_users())
+    
     def get_user(self, username: str) -> Optional[UserInDB]:
         """Get user by username."""
         users = self._load_users()
         return users.get(username)
     
-    def authenticate_user(self, username: str, password: str) -> Optional[UserInDB]:
+    async def _run_hashing(self, func, *args):
+        """Run a password hashing call on the hashing thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._hash_executor, func, *args)
+    
+    async def authenticate_user(self, username: str, password: str) -> Optional[UserInDB]:
         """Authenticate user."""
         user = self.get_user(username)
         if not user:
             return None
-        if not self.verify_password(password, user.hashed_password):
+        if not await self._run_hashing(self.verify_password, password, user.hashed_password):
             return None
         
-        # Update last login
-        users = self._load_users()
-        users[username].last_login = datetime.now().isoformat()
-        self._save_users(users)
+        # Update last login on the cached user; the file is written in the background
+        self._record_login(user)
         
         return user
     
-    def create_user(self, user_create: UserCreate) -> UserInDB:
-        """Create new user."""
-        users = self._load_users()
-        
+    def _check_available(self, users: Dict[str, UserInDB], user_create: UserCreate):
+        """Raise if the username or email is already registered."""
         # Check if user already exists
         if user_create.username in users:
             raise HTTPException(
@@ -150,9 +329,13 @@ class AuthManager:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email already registered"
                 )
+    
+    async def create_user(self, user_create: UserCreate) -> UserInDB:
+        """Create new user."""
+        self._check_available(self._load_users(), user_create)
         
         # Create new user
-        hashed_password = self.get_password_hash(user_create.password)
+        hashed_password = await self._run_hashing(self.get_password_hash, user_create.password)
         new_user = UserInDB(
             username=user_create.username,
             email=user_create.email,
@@ -161,8 +344,13 @@ class AuthManager:
             created_at=datetime.now().isoformat()
         )
         
-        users[user_create.username] = new_user
-        self._save_users(users)
+        # Another registration, here or in another worker, may have finished while hashing
+        with self._cache_lock:
+            users = self._reload_users()
+            self._check_available(users, user_create)
+            
+            users[user_create.username] = new_user
+            self._write_users(users)
         
         return new_user
     
@@ -180,14 +368,35 @@ class AuthManager:
     
     def verify_token(self, token: str) -> Optional[str]:
         """Verify JWT token and return username."""
+        now = time.time()
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            if now < cached[1]:
+                self._token_cache.move_to_end(token)
+                return cached[0]
+            self._token_cache.pop(token, None)
+        
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            if ALGORITHM == "HS256":
+                payload = _decode_hs256(token)
+            else:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
             if username is None:
                 return None
-            return username
         except JWTError:
             return None
+        
+        # Never trust a cached token past its own expiry
+        expires_at = now + TOKEN_CACHE_TTL_SECONDS
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        
+        self._token_cache[token] = (username, expires_at)
+        if len(self._token_cache) > TOKEN_CACHE_SIZE:
+            self._token_cache.popitem(last=False)
+        
+        return username
 
 
 # Global auth manager instance
@@ -219,7 +428,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Inactive user"
         )
     
-    return User(**user.dict())
+    return User(**msgspec.structs.asdict(user))
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -4,11 +4,12 @@ Main FastAPI application for the Research Assistant API.
 
 import time
 from datetime import datetime, timedelta
+from itertools import islice
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.security import HTTPBearer
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 
 from .auth import (
     auth_manager, get_current_active_user, User, UserCreate, UserLogin, Token
@@ -28,7 +29,8 @@ app = FastAPI(
     description="AI-powered research assistant with LangGraph & Gemini 2.0 Flash",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Setup middleware
@@ -38,6 +40,20 @@ setup_middleware(app)
 security = HTTPBearer()
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background audit log and users file flushing."""
+    await audit_logger.start()
+    await auth_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending audit log entries and user changes."""
+    await auth_manager.stop()
+    await audit_logger.stop()
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler."""
@@ -61,7 +77,7 @@ async def register(user_create: UserCreate, request: Request):
         client_ip = request.client.host if request.client else "unknown"
         
         # Create user
-        new_user = auth_manager.create_user(user_create)
+        new_user = await auth_manager.create_user(user_create)
         
         # Log registration
         audit_logger.log_user_registration(
@@ -93,7 +109,7 @@ async def login(user_login: UserLogin, request: Request):
         user_agent = request.headers.get("user-agent", "unknown")
         
         # Authenticate user
-        user = auth_manager.authenticate_user(user_login.username, user_login.password)
+        user = await auth_manager.authenticate_user(user_login.username, user_login.password)
         
         if not user:
             # Log failed attempt
@@ -101,7 +117,8 @@ async def login(user_login: UserLogin, request: Request):
                 username=user_login.username,
                 ip_address=client_ip,
                 user_agent=user_agent,
-                reason="Invalid credentials"
+                reason="Invalid credentials",
+                user_exists=auth_manager.get_user(user_login.username) is not None
             )
             
             raise HTTPException(
@@ -151,7 +168,7 @@ async def create_research(
         client_ip = request.client.host if request.client else "unknown"
         
         # Create research request
-        request_id = research_manager.create_request(
+        request_id = await research_manager.create_request(
             query=research_request.query,
             username=current_user.username,
             thread_id=research_request.thread_id,
@@ -160,10 +177,10 @@ async def create_research(
         )
         
         # Start research execution
-        research_manager.start_research(request_id)
+        await research_manager.start_research(request_id)
         
         # Get and return request data
-        request_data = research_manager.get_request(request_id)
+        request_data = await research_manager.get_request(request_id)
         return research_manager.to_response_model(request_data)
         
     except Exception as e:
@@ -179,7 +196,7 @@ async def get_research(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get research request details."""
-    request_data = research_manager.get_request(request_id)
+    request_data = await research_manager.get_request(request_id)
     
     if not request_data:
         raise HTTPException(
@@ -197,30 +214,51 @@ async def get_research(
     return research_manager.to_response_model(request_data)
 
 
+@app.get("/research/{request_id}/wait", response_model=ResearchResponse)
+async def wait_for_research(
+    request_id: str,
+    timeout: float = Query(30, ge=0, le=60),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Wait up to ``timeout`` seconds for a research request to finish, then return it."""
+    request_data = await research_manager.get_request(request_id)
+    if not request_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Research request not found"
+        )
+    
+    # Check ownership before waiting
+    if request_data["username"] != current_user.username:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    request_data = await research_manager.wait_for_request(request_id, timeout)
+    return research_manager.to_response_model(request_data)
+
+
 @app.get("/research", response_model=ResearchListResponse)
 async def list_research(
-    page: int = 1,
-    per_page: int = 20,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
     current_user: User = Depends(get_current_active_user)
 ):
     """List user's research requests."""
-    if per_page > 100:
-        per_page = 100
-    
-    requests, total = research_manager.get_user_requests(
+    requests, total = await research_manager.get_user_requests(
         username=current_user.username,
         page=page,
         per_page=per_page
     )
     
-    items = [research_manager.to_summary_model(req) for req in requests]
-    
-    return ResearchListResponse(
-        total=total,
-        page=page,
-        per_page=per_page,
-        items=items
-    )
+    # The page is already in memory, so there is nothing to gain from streaming it
+    return ORJSONResponse({
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "items": [research_manager.to_summary_dict(req) for req in requests]
+    })
 
 
 # User profile endpoints
@@ -235,66 +273,66 @@ async def get_profile(current_user: User = Depends(get_current_active_user)):
         )
     
     # Get user statistics
-    requests, total = research_manager.get_user_requests(current_user.username, per_page=1000)
-    successful = sum(1 for req in requests if req["status"] == "completed")
-    failed = sum(1 for req in requests if req["status"] == "failed")
+    total, successful, failed = await research_manager.get_user_stats(current_user.username)
     
-    return UserProfile(
-        username=user_db.username,
-        email=user_db.email,
-        full_name=user_db.full_name,
-        created_at=user_db.created_at,
-        last_login=user_db.last_login,
-        total_research_requests=total,
-        successful_requests=successful,
-        failed_requests=failed
-    )
+    return ORJSONResponse({
+        "username": user_db.username,
+        "email": user_db.email,
+        "full_name": user_db.full_name,
+        "created_at": user_db.created_at,
+        "last_login": user_db.last_login,
+        "total_research_requests": total,
+        "successful_requests": successful,
+        "failed_requests": failed
+    })
 
 
 # System endpoints
 @app.get("/health", response_model=HealthResponse)
 async def health_check(request: Request):
     """Health check endpoint."""
-    uptime = time.time() - getattr(request.app.state, 'start_time', time.time())
+    stats = request.app.state.request_stats
+    uptime = time.time() - stats.start_time
     
     return HealthResponse(
         status="healthy",
         timestamp=datetime.now().isoformat(),
         version="1.0.0",
         uptime_seconds=uptime,
-        active_requests=getattr(request.app.state, 'active_requests', 0),
-        total_requests=getattr(request.app.state, 'total_requests', 0),
-        total_users=len(auth_manager._load_users()),
+        active_requests=stats.active_requests,
+        total_requests=stats.total_requests,
+        total_users=auth_manager.count_users(),
         config=Config.get_safe_config()
     )
 
 
 @app.get("/audit", response_model=AuditLogResponse)
 async def get_audit_logs(
-    page: int = 1,
-    per_page: int = 50,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=100),
     days: int = 7,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get audit logs (user can only see their own logs)."""
-    if per_page > 100:
-        per_page = 100
-    
-    # Get user's audit logs
-    logs = audit_logger.get_recent_logs(days=days, username=current_user.username)
-    
     # Pagination
-    total = len(logs)
     start = (page - 1) * per_page
     end = start + per_page
-    paginated_logs = logs[start:end]
     
-    return AuditLogResponse(
-        total=total,
-        page=page,
-        per_page=per_page,
-        entries=paginated_logs
-    )
+    # Include entries still waiting in the write buffer
+    audit_logger.flush()
+    logs = audit_logger.iter_recent_logs(days=days, username=current_user.username)
+    
+    def stream():
+        # Log lines are already JSON; copy the page through, then stop reading
+        yield b'{"page":%d,"per_page":%d,"entries":[' % (page, per_page)
+        for index, line in enumerate(islice(logs, start, end)):
+            yield line if index == 0 else b"," + line
+        
+        # Entries end with a newline, so the total is a byte count, not a parse
+        total = audit_logger.count_recent_logs(days=days, username=current_user.username)
+        yield b'],"total":%d}' % total
+    
+    return StreamingResponse(stream(), media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -3,9 +3,10 @@ Middleware for the Research Assistant API.
 Handles audit logging, request tracking, and CORS.
 """
 
+import itertools
 import time
 import uuid
-from typing import Callable
+from typing import Callable, FrozenSet
 
 from fastapi import Request, Response
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,10 +15,21 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from .audit import audit_logger, AuditAction, AuditLevel
 
 
+# Health probes and API docs are not audited
+DEFAULT_AUDIT_EXCLUDE_PATHS = frozenset({"/health", "/docs", "/redoc", "/openapi.json"})
+
+
 class AuditMiddleware(BaseHTTPMiddleware):
     """Middleware for audit logging."""
     
+    def __init__(self, app, exclude_paths: FrozenSet[str] = DEFAULT_AUDIT_EXCLUDE_PATHS):
+        super().__init__(app)
+        self.exclude_paths = exclude_paths
+    
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if request.url.path in self.exclude_paths:
+            return await call_next(request)
+        
         # Generate request ID
         request_id = str(uuid.uuid4())
         request.state.request_id = request_id
@@ -55,7 +67,8 @@ class AuditMiddleware(BaseHTTPMiddleware):
                 ip_address=client_ip,
                 user_agent=user_agent,
                 status_code=response.status_code,
-                duration_ms=duration_ms
+                duration_ms=duration_ms,
+                per_user=username is not None
             )
             
             # Add request ID to response headers
@@ -80,38 +93,45 @@ class AuditMiddleware(BaseHTTPMiddleware):
                     "method": request.method,
                     "endpoint": str(request.url.path),
                     "error": str(e)
-                }
+                },
+                per_user=username is not None
             )
             
             raise
 
 
-class RequestTrackingMiddleware(BaseHTTPMiddleware):
-    """Middleware for request tracking and statistics."""
+class RequestStats:
+    """Request counters shared between the tracking middleware and /health."""
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self):
+        self._counter = itertools.count(1)
         self.total_requests = 0
         self.active_requests = 0
         self.start_time = time.time()
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Increment counters
-        self.total_requests += 1
+    def request_started(self):
+        """Count a new in-flight request."""
+        self.total_requests = next(self._counter)
         self.active_requests += 1
-        
-        # Store stats in app state
-        request.app.state.total_requests = self.total_requests
-        request.app.state.active_requests = self.active_requests
-        request.app.state.start_time = self.start_time
-        
+    
+    def request_finished(self):
+        """Mark an in-flight request as done."""
+        self.active_requests -= 1
+
+
+class RequestTrackingMiddleware(BaseHTTPMiddleware):
+    """Middleware for request tracking and statistics."""
+    
+    def __init__(self, app, stats: RequestStats):
+        super().__init__(app)
+        self.stats = stats
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        self.stats.request_started()
         try:
-            response = await call_next(request)
-            return response
+            return await call_next(request)
         finally:
-            # Decrement active requests
-            self.active_requests -= 1
-            request.app.state.active_requests = self.active_requests
+            self.stats.request_finished()
 
 
 def setup_middleware(app):
@@ -126,8 +146,9 @@ def setup_middleware(app):
         allow_headers=["*"],
     )
     
-    # Request tracking middleware
-    app.add_middleware(RequestTrackingMiddleware)
+    # Request tracking middleware; /health reads the stats from app state
+    app.state.request_stats = RequestStats()
+    app.add_middleware(RequestTrackingMiddleware, stats=app.state.request_stats)
     
     # Audit logging middleware
     app.add_middleware(AuditMiddleware)
\ No newline at end of file
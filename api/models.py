@@ -6,7 +6,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ResearchStatus(str, Enum):
@@ -25,20 +25,26 @@ class ResearchRequest(BaseModel):
     save_report: bool = Field(True, description="Save report to markdown file")
 
 
-class ResearchResponse(BaseModel):
-    """Research response model."""
+class ResearchBase(BaseModel):
+    """Fields shared by research responses and summaries."""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+    
     request_id: str
     status: ResearchStatus
     query: str
-    thread_id: Optional[str] = None
     created_at: str
-    updated_at: str
     username: str
+    sources_count: Optional[int] = None
+    confidence: Optional[float] = None
+
+
+class ResearchResponse(ResearchBase):
+    """Research response model."""
+    thread_id: Optional[str] = None
+    updated_at: str
     
     # Results (only when completed)
     draft: Optional[str] = None
-    sources_count: Optional[int] = None
-    confidence: Optional[float] = None
     retry_count: Optional[int] = None
     is_safe: Optional[bool] = None
     
@@ -51,15 +57,8 @@ class ResearchResponse(BaseModel):
     report_file: Optional[str] = None
 
 
-class ResearchSummary(BaseModel):
+class ResearchSummary(ResearchBase):
     """Research summary for listing."""
-    request_id: str
-    status: ResearchStatus
-    query: str
-    created_at: str
-    username: str
-    sources_count: Optional[int] = None
-    confidence: Optional[float] = None
 
 
 class ResearchListResponse(BaseModel):
@@ -107,6 +106,7 @@ class AuditLogEntry(BaseModel):
     action: str
     username: Optional[str] = None
     ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
     details: Dict[str, Any] = {}
     request_id: Optional[str] = None
     duration_ms: Optional[int] = None
@@ -4,23 +4,110 @@ Handles research request lifecycle and storage.
 """
 
 import asyncio
-import json
 import os
+import re
+import threading
 import time
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List
-from concurrent.futures import ThreadPoolExecutor
-from dotenv import load_dotenv
+from collections import OrderedDict
+from typing import Dict, Optional, List, Tuple
+
+import orjson
 
 from .models import ResearchStatus, ResearchResponse, ResearchSummary
-from .audit import audit_logger
-from src.graph import ResearchWorkflow
-from src.state import ResearchState
+from .audit import audit_logger, user_storage_name
+from src.state import ResearchState, report_query_name
+
+# Number following "confidence level" on the same or the next line
+CONFIDENCE_PATTERN = re.compile(r"confidence level[^\d\n]*(?:\n[^\d\n]*)?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+# Bounds for the in-memory request caches
+ACTIVE_REQUESTS_CACHE_SIZE = int(os.getenv("ACTIVE_REQUESTS_CACHE_SIZE", "512"))
+REQUEST_FILE_CACHE_SIZE = int(os.getenv("REQUEST_FILE_CACHE_SIZE", "1024"))
+
+# Fields copied from request data into response models
+RESPONSE_FIELDS = tuple(ResearchResponse.model_fields)
+
+# Research workflows allowed to run at the same time
+RESEARCH_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "16"))
+
+# A user's index is rewritten once its superseded rows outnumber both its live
+# rows and this minimum
+INDEX_COMPACT_MIN_ROWS = int(os.getenv("INDEX_COMPACT_MIN_ROWS", "64"))
+
+# Index lock files older than this were left behind by a crashed worker
+INDEX_LOCK_TIMEOUT = float(os.getenv("INDEX_LOCK_TIMEOUT", "30"))
+
+
+# Last read of each request file: path -> ((inode, mtime_ns, size), bytes), in LRU order
+_request_file_cache: "OrderedDict[str, Tuple[Tuple[int, int, int], bytes]]" = OrderedDict()
+_request_file_cache_lock = threading.Lock()
+
+
+def _read_request_cached(path: str) -> Optional[bytes]:
+    """Read a request file, reusing the last read while the file is unchanged (blocking)."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    
+    with f:
+        # Saves replace the file, so the inode changes on every write even when two
+        # writes share one coarse mtime tick; fstat matches the bytes read below
+        stat = os.fstat(f.fileno())
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with _request_file_cache_lock:
+            cached = _request_file_cache.get(path)
+            if cached is not None and cached[0] == key:
+                _request_file_cache.move_to_end(path)
+                return cached[1]
+        
+        content = f.read()
+    
+    # One entry per path, so the bytes of replaced versions are not kept
+    with _request_file_cache_lock:
+        _request_file_cache[path] = (key, content)
+        _request_file_cache.move_to_end(path)
+        while len(_request_file_cache) > REQUEST_FILE_CACHE_SIZE:
+            _request_file_cache.popitem(last=False)
+    return content
+
+
+def _acquire_lock(lock_file: Path):
+    """Create ``lock_file`` exclusively, waiting while another worker holds it (blocking)."""
+    while True:
+        try:
+            os.close(os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o600))
+            return
+        except FileExistsError:
+            pass
+        
+        try:
+            stale = time.time() - lock_file.stat().st_mtime > INDEX_LOCK_TIMEOUT
+        except FileNotFoundError:
+            continue
+        if stale:
+            lock_file.unlink(missing_ok=True)
+        else:
+            time.sleep(0.005)
+
+
+def _release_lock(lock_file: Path):
+    """Remove a lock file created by ``_acquire_lock``."""
+    lock_file.unlink(missing_ok=True)
+
 
-# Load environment variables
-load_dotenv()
+@contextmanager
+def _locked(lock_file: Path):
+    """Hold ``lock_file`` for the duration of the block (blocking)."""
+    _acquire_lock(lock_file)
+    try:
+        yield
+    finally:
+        _release_lock(lock_file)
 
 
 class ResearchManager:
@@ -32,38 +119,246 @@ class ResearchManager:
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         
-        # In-memory storage for active requests
-        self.active_requests: Dict[str, Dict] = {}
+        # In-memory storage for recent requests, least recently used evicted first
+        self.active_requests: "OrderedDict[str, Dict]" = OrderedDict()
         
-        # Thread pool for background research tasks
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        # Response models built from active requests, dropped whenever the request changes
+        self._response_models: Dict[str, ResearchResponse] = {}
+        
+        # Background research runs as asyncio tasks; this bounds how many run at once
+        self._research_slots = asyncio.Semaphore(RESEARCH_MAX_CONCURRENCY)
+        
+        # Set when a started request finishes, for long-polling clients
+        self._finished_events: Dict[str, asyncio.Event] = {}
+        
+        # Research workflow instance, built on first use
+        self._workflow = None
+        
+        # Per-user summary indexes: one appended row per save, newest row per id wins.
+        # Workers change an index file only while holding its lock file
+        self.index_dir = self.storage_dir / "_index"
+        self._index_ready = False
+        self._index_lock = asyncio.Lock()
+    
+    def _get_index_file(self, username: str) -> Path:
+        """Get the summary index file of a user."""
+        return self.index_dir / f"{user_storage_name(username)}.jsonl"
+    
+    @staticmethod
+    def _get_index_lock(index_file: Path) -> Path:
+        """Get the lock file guarding changes to an index file."""
+        return index_file.with_name(f".{index_file.stem}.lock")
+    
+    async def _ensure_index(self):
+        """Build the summary indexes from stored requests if they do not exist yet."""
+        if self._index_ready:
+            return
+        
+        async with self._index_lock:
+            if self._index_ready:
+                return
+            
+            marker = self.index_dir / ".built"
+            if not marker.exists():
+                # Only one worker builds; the others wait for it and then find the marker
+                build_lock = self.index_dir / ".build.lock"
+                await asyncio.to_thread(self.index_dir.mkdir, exist_ok=True)
+                await asyncio.to_thread(_acquire_lock, build_lock)
+                try:
+                    if not marker.exists():
+                        await self._build_index(marker)
+                finally:
+                    _release_lock(build_lock)
+            
+            self._index_ready = True
+    
+    async def _build_index(self, marker: Path):
+        """Write one index row for each request saved before the index existed."""
+        rows: Dict[str, List[bytes]] = {}
+        requests = sorted(await self._load_all_requests(), key=self._created_at_ns)
+        for data in requests:
+            try:
+                rows.setdefault(data["username"], []).append(self._index_row(data))
+            except KeyError:
+                continue
+        
+        def write_indexes():
+            for username, user_rows in rows.items():
+                self._write_atomic(self._get_index_file(username), b"".join(user_rows))
+            marker.touch()
+        
+        await asyncio.to_thread(write_indexes)
+    
+    @staticmethod
+    def _created_at_ns(data: Dict) -> int:
+        """Creation time in nanoseconds, as an integer sort key."""
+        created_at_ns = data.get("created_at_ns")
+        if created_at_ns is not None:
+            return created_at_ns
+        
+        # Requests stored before created_at_ns existed
+        try:
+            return int(datetime.fromisoformat(data["created_at"]).timestamp() * 1_000_000_000)
+        except (KeyError, TypeError, ValueError):
+            return 0
+    
+    def _index_row(self, data: Dict) -> bytes:
+        """Serialize the summary index row of a request."""
+        return orjson.dumps(self.to_summary_dict(data), option=orjson.OPT_APPEND_NEWLINE)
+    
+    async def _read_index(self, username: str) -> Dict[str, Dict]:
+        """Read a user's index as request_id -> newest summary row, in creation order."""
+        await self._ensure_index()
+        
+        index_file = self._get_index_file(username)
+        try:
+            content = await asyncio.to_thread(index_file.read_bytes)
+        except FileNotFoundError:
+            content = b""
         
-        # Research workflow instance
-        self.workflow = ResearchWorkflow()
+        summaries, rows = self._parse_index(content)
+        superseded = rows - len(summaries)
+        if superseded > max(INDEX_COMPACT_MIN_ROWS, len(summaries)):
+            await asyncio.to_thread(self._compact_index, index_file)
+        return summaries
+    
+    @staticmethod
+    def _parse_index(content: bytes) -> Tuple[Dict[str, Dict], int]:
+        """Parse index rows into request_id -> newest row, and count the rows."""
+        # Rows are appended in creation order; later rows update a request in place
+        summaries: Dict[str, Dict] = {}
+        rows = 0
+        for line in content.splitlines():
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            summaries[row["request_id"]] = row
+            rows += 1
+        return summaries, rows
+    
+    def _compact_index(self, index_file: Path):
+        """Rewrite an index with only the newest row of each request (blocking)."""
+        with _locked(self._get_index_lock(index_file)):
+            # Re-read under the lock so rows appended since the caller's read are kept
+            try:
+                content = index_file.read_bytes()
+            except FileNotFoundError:
+                return
+            summaries, _ = self._parse_index(content)
+            self._write_atomic(
+                index_file,
+                b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in summaries.values())
+            )
+    
+    async def _append_index(self, data: Dict):
+        """Append the current summary of a request to its user's index."""
+        await self._ensure_index()
+        
+        index_file = self._get_index_file(data["username"])
+        row = self._index_row(data)
+        
+        def append():
+            # The lock keeps a compaction from replacing the file under this write
+            with _locked(self._get_index_lock(index_file)):
+                with open(index_file, 'ab') as f:
+                    f.write(row)
+        
+        await asyncio.to_thread(append)
+    
+    @property
+    def workflow(self):
+        """Research workflow; LangGraph and the LLM clients load on first access."""
+        if self._workflow is None:
+            from src.graph import get_workflow
+            self._workflow = get_workflow()
+        return self._workflow
     
     def _get_request_file(self, request_id: str) -> Path:
         """Get file path for request data."""
         return self.storage_dir / f"{request_id}.json"
     
-    def _save_request(self, request_id: str, data: Dict):
-        """Save request data to file."""
-        request_file = self._get_request_file(request_id)
-        with open(request_file, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _get_draft_file(self, request_id: str) -> Path:
+        """Get file path for the draft of a request."""
+        return self.storage_dir / f"{request_id}.md"
     
-    def _load_request(self, request_id: str) -> Optional[Dict]:
-        """Load request data from file."""
+    async def _save_request(self, request_id: str, data: Dict):
+        """Save request data to file."""
         request_file = self._get_request_file(request_id)
-        if not request_file.exists():
-            return None
         
+        # Drafts go to a sibling file so scans of request files stay small
+        stored = data
+        if data.get("draft_file") and data.get("draft") is not None:
+            draft_file = self._get_draft_file(request_id)
+            await asyncio.to_thread(self._write_atomic, draft_file, data["draft"].encode("utf-8"))
+            stored = {**data, "draft": None}
+        
+        # Serialize here so the dict is not read while other coroutines update it;
+        # only the disk write runs on a worker thread
+        content = orjson.dumps(stored, option=orjson.OPT_INDENT_2)
+        await asyncio.to_thread(self._write_atomic, request_file, content)
+        
+        await self._append_index(data)
+    
+    @staticmethod
+    def _write_atomic(path: Path, content: bytes):
+        """Write a file via a temp file and rename so readers never see it half written."""
+        tmp_file = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
         try:
-            with open(request_file, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            tmp_file.write_bytes(content)
+            os.replace(tmp_file, path)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+    
+    @staticmethod
+    def _read_request_file(request_file: Path) -> Optional[Dict]:
+        """Read and parse one request file (blocking)."""
+        try:
+            with open(request_file, 'rb') as f:
+                return orjson.loads(f.read())
+        except (orjson.JSONDecodeError, FileNotFoundError):
             return None
     
-    def create_request(
+    async def _load_all_requests(self) -> List[Dict]:
+        """Load every stored request, reading files concurrently."""
+        request_files = await asyncio.to_thread(lambda: list(self.storage_dir.glob("*.json")))
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self._read_request_file, request_file)
+            for request_file in request_files
+        ])
+        return [data for data in results if data is not None]
+    
+    async def _load_request(self, request_id: str) -> Optional[Dict]:
+        """Load request data from file, reusing the read while the file is unchanged."""
+        request_file = self._get_request_file(request_id)
+        
+        def load():
+            # Decode on every call so callers get their own dict to change
+            content = _read_request_cached(str(request_file))
+            try:
+                data = orjson.loads(content) if content is not None else None
+            except orjson.JSONDecodeError:
+                return None
+            if data and data.get("draft_file") and data.get("draft") is None:
+                try:
+                    data["draft"] = self._get_draft_file(request_id).read_text(encoding="utf-8")
+                except FileNotFoundError:
+                    pass
+            return data
+        
+        return await asyncio.to_thread(load)
+    
+    def _remember(self, request_id: str, request_data: Dict):
+        """Keep request data in memory, evicting the least recently used entry."""
+        self.active_requests[request_id] = request_data
+        self.active_requests.move_to_end(request_id)
+        self._response_models.pop(request_id, None)
+        while len(self.active_requests) > ACTIVE_REQUESTS_CACHE_SIZE:
+            evicted_id, _ = self.active_requests.popitem(last=False)
+            self._response_models.pop(evicted_id, None)
+    
+    async def create_request(
         self,
         query: str,
         username: str,
@@ -72,7 +367,10 @@ class ResearchManager:
         ip_address: str = "unknown"
     ) -> str:
         """Create a new research request."""
-        request_id = str(uuid.uuid4())
+        request_id = uuid.uuid4().hex
+        created_at_ns = time.time_ns()
+        created = datetime.fromtimestamp(created_at_ns / 1_000_000_000)
+        now = created.isoformat()
         
         request_data = {
             "request_id": request_id,
@@ -82,8 +380,9 @@ class ResearchManager:
             "save_report": save_report,
             "username": username,
             "ip_address": ip_address,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
+            "created_at": now,
+            "created_at_ns": created_at_ns,
+            "updated_at": now,
             "start_time": None,
             "end_time": None,
             "duration_ms": None,
@@ -101,12 +400,15 @@ class ResearchManager:
             "warnings": [],
             
             # File info
-            "report_file": None
+            "report_file": None,
+            "report_name": self._get_report_filename(
+                {"save_report": save_report, "query": query, "thread_id": thread_id}, created
+            )
         }
         
         # Save to file and memory
-        self._save_request(request_id, request_data)
-        self.active_requests[request_id] = request_data
+        await self._save_request(request_id, request_data)
+        self._remember(request_id, request_data)
         
         # Log request creation
         audit_logger.log_research_start(
@@ -118,19 +420,22 @@ class ResearchManager:
         
         return request_id
     
-    def start_research(self, request_id: str) -> bool:
+    async def start_research(self, request_id: str) -> bool:
         """Start research execution in background."""
-        request_data = self.get_request(request_id)
+        request_data = await self.get_request(request_id)
         if not request_data or request_data["status"] != ResearchStatus.PENDING:
             return False
         
-        # Update status
+        # Update status; a cached model of the old state must not outlive this change
+        self._response_models.pop(request_id, None)
         request_data["status"] = ResearchStatus.RUNNING
-        request_data["start_time"] = time.time()
-        request_data["updated_at"] = datetime.now().isoformat()
+        now = time.time()
+        request_data["start_time"] = now
+        request_data["updated_at"] = datetime.fromtimestamp(now).isoformat()
         
-        self._save_request(request_id, request_data)
-        self.active_requests[request_id] = request_data
+        await self._save_request(request_id, request_data)
+        self._remember(request_id, request_data)
+        self._finished_events[request_id] = asyncio.Event()
         
         # Start background task
         asyncio.create_task(self._execute_research(request_id))
@@ -139,29 +444,33 @@ class ResearchManager:
     
     async def _execute_research(self, request_id: str):
         """Execute research in background."""
-        request_data = self.get_request(request_id)
+        request_data = await self.get_request(request_id)
         if not request_data:
             return
         
         try:
             # Run research workflow
-            result = await self.workflow.run_research(
-                query=request_data["query"],
-                thread_id=request_data["thread_id"]
-            )
+            async with self._research_slots:
+                result = await self.workflow.run_research(
+                    query=request_data["query"],
+                    thread_id=request_data["thread_id"]
+                )
             
             # Calculate duration
-            duration_ms = int((time.time() - request_data["start_time"]) * 1000)
+            end_time = time.time()
+            duration_ms = int((end_time - request_data["start_time"]) * 1000)
             
-            # Update request with results
+            # Update request with results; readers rebuild the model until it is saved
+            self._response_models.pop(request_id, None)
             request_data.update({
                 "status": ResearchStatus.COMPLETED,
-                "end_time": time.time(),
+                "end_time": end_time,
                 "duration_ms": duration_ms,
-                "updated_at": datetime.now().isoformat(),
+                "updated_at": datetime.fromtimestamp(end_time).isoformat(),
                 
-                # Results from research state
+                # Results from research state; the draft is stored in its own file
                 "draft": result.get("draft"),
+                "draft_file": f"{request_id}.md" if result.get("draft") else None,
                 "sources_count": len(result.get("sources", [])),
                 "confidence": self._extract_confidence(result.get("draft", "")),
                 "retry_count": result.get("retry_count", 0),
@@ -170,7 +479,7 @@ class ResearchManager:
                 "warnings": result.get("warnings", []),
                 
                 # Report file info
-                "report_file": self._get_report_filename(request_data)
+                "report_file": request_data.get("report_name") or self._get_report_filename(request_data)
             })
             
             # Log completion
@@ -184,14 +493,16 @@ class ResearchManager:
             
         except Exception as e:
             # Calculate duration
-            duration_ms = int((time.time() - request_data["start_time"]) * 1000)
+            end_time = time.time()
+            duration_ms = int((end_time - request_data["start_time"]) * 1000)
             
             # Update request with error
+            self._response_models.pop(request_id, None)
             request_data.update({
                 "status": ResearchStatus.FAILED,
-                "end_time": time.time(),
+                "end_time": end_time,
                 "duration_ms": duration_ms,
-                "updated_at": datetime.now().isoformat(),
+                "updated_at": datetime.fromtimestamp(end_time).isoformat(),
                 "error_message": str(e),
                 "errors": [str(e)]
             })
@@ -206,39 +517,48 @@ class ResearchManager:
         
         finally:
             # Save final state
-            self._save_request(request_id, request_data)
-            self.active_requests[request_id] = request_data
+            await self._save_request(request_id, request_data)
+            self._remember(request_id, request_data)
+            
+            finished = self._finished_events.pop(request_id, None)
+            if finished is not None:
+                finished.set()
     
-    def get_request(self, request_id: str) -> Optional[Dict]:
+    async def wait_for_request(self, request_id: str, timeout: float) -> Optional[Dict]:
+        """Get request data once the request finishes or ``timeout`` seconds pass."""
+        finished = self._finished_events.get(request_id)
+        if finished is not None:
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        
+        return await self.get_request(request_id)
+    
+    async def get_request(self, request_id: str) -> Optional[Dict]:
         """Get request data."""
         # Try memory first
         if request_id in self.active_requests:
+            self.active_requests.move_to_end(request_id)
             return self.active_requests[request_id]
         
         # Try file storage
-        return self._load_request(request_id)
+        return await self._load_request(request_id)
     
-    def get_user_requests(
+    async def get_user_requests(
         self,
         username: str,
         page: int = 1,
         per_page: int = 20
     ) -> tuple[List[Dict], int]:
-        """Get user's research requests."""
-        all_requests = []
-        
-        # Load all request files
-        for request_file in self.storage_dir.glob("*.json"):
-            try:
-                with open(request_file, 'r') as f:
-                    data = json.load(f)
-                    if data.get("username") == username:
-                        all_requests.append(data)
-            except (json.JSONDecodeError, FileNotFoundError):
-                continue
+        """
+        Get summaries of a user's research requests, newest first.
         
-        # Sort by created_at (newest first)
-        all_requests.sort(key=lambda x: x["created_at"], reverse=True)
+        Reads only the user's index, not the request files. Items have
+        the fields of ``to_summary_dict``.
+        """
+        summaries = await self._read_index(username)
+        all_requests = list(reversed(summaries.values()))
         
         # Pagination
         total = len(all_requests)
@@ -247,36 +567,38 @@ class ResearchManager:
         
         return all_requests[start:end], total
     
+    async def get_user_stats(self, username: str) -> Tuple[int, int, int]:
+        """Get (total, successful, failed) request counts for a user."""
+        # The index on disk is shared by all workers, so counts are never stale
+        statuses = [row["status"] for row in (await self._read_index(username)).values()]
+        successful = sum(1 for s in statuses if s == ResearchStatus.COMPLETED)
+        failed = sum(1 for s in statuses if s == ResearchStatus.FAILED)
+        return len(statuses), successful, failed
+    
     def _extract_confidence(self, draft: str) -> float:
         """Extract confidence level from draft text."""
         if not draft:
             return 0.0
         
-        # Look for confidence level in the draft
-        lines = draft.split('\n')
-        for line in lines:
-            if 'confidence level' in line.lower():
-                try:
-                    # Extract number from line like "0.85 (out of 1.0)"
-                    parts = line.split()
-                    for part in parts:
-                        if part.replace('.', '').isdigit():
-                            confidence = float(part)
-                            if 0.0 <= confidence <= 1.0:
-                                return confidence
-                except (ValueError, IndexError):
-                    continue
+        # Value on the "Confidence Level" line or the line after it,
+        # e.g. "## Confidence Level\n0.85 (out of 1.0)"
+        match = CONFIDENCE_PATTERN.search(draft)
+        if match:
+            confidence = float(match.group(1))
+            if 0.0 <= confidence <= 1.0:
+                return confidence
         
         return 0.8  # Default confidence
     
-    def _get_report_filename(self, request_data: Dict) -> Optional[str]:
+    def _get_report_filename(self, request_data: Dict, created: Optional[datetime] = None) -> Optional[str]:
         """Generate report filename."""
         if not request_data.get("save_report"):
             return None
         
-        timestamp = datetime.fromisoformat(request_data["created_at"]).strftime("%Y%m%d_%H%M%S")
-        query_safe = "".join(c for c in request_data["query"][:50] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        query_safe = query_safe.replace(' ', '_')
+        if created is None:
+            created = datetime.fromisoformat(request_data["created_at"])
+        timestamp = created.strftime("%Y%m%d_%H%M%S")
+        query_safe = report_query_name(request_data["query"])
         
         if request_data.get("thread_id"):
             return f"{timestamp}_{request_data['thread_id']}_{query_safe}.md"
@@ -285,19 +607,39 @@ class ResearchManager:
     
     def to_response_model(self, request_data: Dict) -> ResearchResponse:
         """Convert request data to response model."""
-        return ResearchResponse(**request_data)
+        # Models are frozen, so one built from an active request is shared
+        # until the request is saved again
+        request_id = request_data["request_id"]
+        model = self._response_models.get(request_id)
+        if model is not None:
+            return model
+        
+        # Request data is produced by this manager, so skip re-validation
+        fields = {k: request_data[k] for k in RESPONSE_FIELDS if k in request_data}
+        fields["status"] = ResearchStatus(fields["status"])
+        model = ResearchResponse.model_construct(**fields)
+        
+        if self.active_requests.get(request_id) is request_data:
+            self._response_models[request_id] = model
+        return model
+    
+    def to_summary_dict(self, request_data: Dict) -> Dict:
+        """Extract the summary fields of request data as a plain dict."""
+        return {
+            "request_id": request_data["request_id"],
+            "status": request_data["status"],
+            "query": request_data["query"],
+            "created_at": request_data["created_at"],
+            "username": request_data["username"],
+            "sources_count": request_data.get("sources_count"),
+            "confidence": request_data.get("confidence")
+        }
     
     def to_summary_model(self, request_data: Dict) -> ResearchSummary:
         """Convert request data to summary model."""
-        return ResearchSummary(
-            request_id=request_data["request_id"],
-            status=request_data["status"],
-            query=request_data["query"],
-            created_at=request_data["created_at"],
-            username=request_data["username"],
-            sources_count=request_data.get("sources_count"),
-            confidence=request_data.get("confidence")
-        )
+        fields = self.to_summary_dict(request_data)
+        fields["status"] = ResearchStatus(fields["status"])
+        return ResearchSummary.model_construct(**fields)
 
 
 # Global research manager instance
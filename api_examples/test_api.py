@@ -8,6 +8,9 @@ import json
 import time
 from typing import Optional
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 
 class APIClient:
     """Simple API client for testing."""
@@ -16,6 +19,11 @@ class APIClient:
         self.base_url = base_url
         self.token: Optional[str] = None
         self.session = requests.Session()
+        
+        # Reuse a small connection pool and retry transient connection failures
+        adapter = HTTPAdapter(pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def _headers(self) -> dict:
         """Get headers with authentication."""
@@ -104,6 +112,17 @@ class APIClient:
         
         return response.json()
     
+    def wait_for_research(self, request_id: str, timeout: int = 30) -> dict:
+        """Wait on the server until research finishes or the timeout passes."""
+        response = self.session.get(
+            f"{self.base_url}/research/{request_id}/wait",
+            params={"timeout": timeout},
+            headers=self._headers(),
+            timeout=timeout + 10
+        )
+        
+        return response.json()
+    
     def list_research(self, page: int = 1, per_page: int = 20) -> dict:
         """List research requests."""
         params = {"page": page, "per_page": per_page}
@@ -195,9 +214,8 @@ def test_complete_workflow():
     # Wait and check research progress
     print("\\n6. Monitor Research Progress")
     for i in range(10):  # Check for up to 10 times
-        time.sleep(5)  # Wait 5 seconds
-        
-        status = client.get_research(request_id)
+        # Long-poll: the server answers as soon as the research finishes
+        status = client.wait_for_research(request_id, timeout=30)
         print(f"Check {i+1}: Status = {status['status']}")
         
         if status['status'] in ['completed', 'failed']:
@@ -3,21 +3,16 @@
 API server runner for the Research Assistant API.
 """
 
-import uvicorn
 import argparse
 import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Add project root to path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from api.main import app
+# Importing the config loads the .env file
 from src.config import Config
 
 
@@ -58,8 +53,19 @@ def main():
         help="Log level (default from .env or info)"
     )
     
+    parser.add_argument(
+        "--access-log",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Log every request to the console (default: on with a single worker; "
+             "requests are always recorded in the audit log)"
+    )
+    
     args = parser.parse_args()
     
+    if args.access_log is None:
+        args.access_log = args.workers <= 1 or args.reload
+    
     # Validate configuration
     if not Config.validate_config():
         print("ERROR: Configuration validation failed!")
@@ -72,8 +78,16 @@ def main():
     print(f"Reload: {args.reload}")
     print(f"Workers: {args.workers}")
     print(f"Log Level: {args.log_level}")
+    print(f"Access Log: {args.access_log}")
     print("-" * 50)
     
+    # Imported only once the arguments and configuration are known to be good;
+    # the app itself is loaded by uvicorn from the import string.
+    # uvicorn always spawns (never forks) its workers, so modules preloaded here
+    # would not be shared with them; instead each worker keeps its startup cheap
+    # by loading the research workflow (LangGraph, Gemini, Tavily) on first use.
+    import uvicorn
+    
     # Run server
     uvicorn.run(
         "api.main:app",
@@ -82,7 +96,7 @@ def main():
         reload=args.reload,
         workers=args.workers if not args.reload else 1,  # Workers don't work with reload
         log_level=args.log_level,
-        access_log=True
+        access_log=args.access_log
     )
 
 
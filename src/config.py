@@ -3,15 +3,71 @@ Configuration management for the Research Assistant Agent.
 Handles environment variables, API keys, and system settings.
 """
 
+import functools
+import logging
 import os
-from typing import List, Set
+import sys
+from typing import Dict, List, Set
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _read_env() -> Dict:
+    """Read the environment-backed settings."""
+    return {
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", ""),
+        "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", ""),
+        "TEMPERATURE": float(os.getenv("TEMPERATURE", "0.1")),
+        "MAX_OUTPUT_TOKENS": int(os.getenv("MAX_OUTPUT_TOKENS", "1000")),
+        "MAX_RETRIES": int(os.getenv("MAX_RETRIES", "3")),
+        "RATE_LIMIT_REQUESTS_PER_MINUTE": int(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "60")),
+        "MAX_CONCURRENT_SEARCHES": int(os.getenv("MAX_CONCURRENT_SEARCHES", "8")),
+        "CHECKPOINT_PATH": os.getenv("CHECKPOINTS_DIR", "./checkpoints"),
+    }
+
+
+# Environment settings, read once at import (see Config.reload)
+_ENV = _read_env()
+
+@functools.lru_cache(maxsize=None)
+def _validate_api_keys(gemini_api_key: str, tavily_api_key: str) -> bool:
+    """Check a pair of API keys once, printing the first problem found."""
+    # Check if API keys are present and valid
+    if not gemini_api_key or gemini_api_key.startswith("your_"):
+        print("ERROR: GEMINI_API_KEY not found or invalid")
+        return False
+    
+    if not tavily_api_key or tavily_api_key.startswith("your_"):
+        print("ERROR: TAVILY_API_KEY not found or invalid")
+        return False
+    
+    # Validate Gemini API key format (should start with 'AIza')
+    if not gemini_api_key.startswith('AIza') or len(gemini_api_key) < 30:
+        print("ERROR: GEMINI_API_KEY appears to be invalid format")
+        return False
+    
+    # Validate Tavily API key format (should start with 'tvly-')
+    if not tavily_api_key.startswith('tvly-') or len(tavily_api_key) < 20:
+        print("ERROR: TAVILY_API_KEY appears to be invalid format")
+        return False
+    
+    return True
+
+
+# Progress output of the research workflow; set WORKFLOW_LOG_LEVEL=WARNING
+# to keep successful runs quiet (e.g. under the API)
+workflow_logger = logging.getLogger("research")
+if not workflow_logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    workflow_logger.addHandler(_handler)
+    workflow_logger.propagate = False
+workflow_logger.setLevel(os.getenv("WORKFLOW_LOG_LEVEL", "INFO").upper())
+
 # Validate that .env file was loaded
-if not os.getenv("GEMINI_API_KEY") and not os.getenv("TAVILY_API_KEY"):
+if not _ENV["GEMINI_API_KEY"] and not _ENV["TAVILY_API_KEY"]:
     print("WARNING: No API keys found in environment variables.")
     print("Please ensure .env file exists with GEMINI_API_KEY and TAVILY_API_KEY")
 
@@ -20,20 +76,22 @@ class Config:
     """Configuration class for the research agent."""
     
     # API Keys (loaded from .env file)
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
-    TAVILY_API_KEY: str = os.getenv("TAVILY_API_KEY", "")
+    GEMINI_API_KEY: str = _ENV["GEMINI_API_KEY"]
+    TAVILY_API_KEY: str = _ENV["TAVILY_API_KEY"]
     
     # LLM Configuration
     GEMINI_MODEL: str = "gemini-2.0-flash"
-    TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.1"))
-    MAX_OUTPUT_TOKENS: int = int(os.getenv("MAX_OUTPUT_TOKENS", "1000"))
+    TEMPERATURE: float = _ENV["TEMPERATURE"]
+    MAX_OUTPUT_TOKENS: int = _ENV["MAX_OUTPUT_TOKENS"]
     
     # Workflow Configuration
-    MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
+    MAX_RETRIES: int = _ENV["MAX_RETRIES"]
     MAX_SEARCH_RESULTS: int = 10
     
     # Rate Limiting
-    RATE_LIMIT_REQUESTS_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "60"))
+    RATE_LIMIT_REQUESTS_PER_MINUTE: int = _ENV["RATE_LIMIT_REQUESTS_PER_MINUTE"]
+    # Tavily calls (searches and extracts) in flight at once, across all research runs sharing a workflow
+    MAX_CONCURRENT_SEARCHES: int = _ENV["MAX_CONCURRENT_SEARCHES"]
     
     # Safety Configuration
     TRUSTED_DOMAINS: Set[str] = {
@@ -102,31 +160,20 @@ class Config:
     
     # Checkpointing
     CHECKPOINT_ENABLED: bool = True
-    CHECKPOINT_PATH: str = "./checkpoints"
+    CHECKPOINT_PATH: str = _ENV["CHECKPOINT_PATH"]
+    
+    @classmethod
+    def reload(cls):
+        """Re-read settings from the environment and .env file."""
+        load_dotenv(override=True)
+        _ENV.update(_read_env())
+        for key, value in _ENV.items():
+            setattr(cls, key, value)
     
     @classmethod
     def validate_config(cls) -> bool:
         """Validate that all required configuration is present."""
-        # Check if API keys are present and valid
-        if not cls.GEMINI_API_KEY or cls.GEMINI_API_KEY.startswith("your_"):
-            print("ERROR: GEMINI_API_KEY not found or invalid")
-            return False
-        
-        if not cls.TAVILY_API_KEY or cls.TAVILY_API_KEY.startswith("your_"):
-            print("ERROR: TAVILY_API_KEY not found or invalid")
-            return False
-        
-        # Validate Gemini API key format (should start with 'AIza')
-        if not cls.GEMINI_API_KEY.startswith('AIza') or len(cls.GEMINI_API_KEY) < 30:
-            print("ERROR: GEMINI_API_KEY appears to be invalid format")
-            return False
-        
-        # Validate Tavily API key format (should start with 'tvly-')
-        if not cls.TAVILY_API_KEY.startswith('tvly-') or len(cls.TAVILY_API_KEY) < 20:
-            print("ERROR: TAVILY_API_KEY appears to be invalid format")
-            return False
-        
-        return True
+        return _validate_api_keys(cls.GEMINI_API_KEY, cls.TAVILY_API_KEY)
     
     @classmethod
     def get_safe_config(cls) -> dict:
@@ -3,24 +3,101 @@ LangGraph workflow orchestration for the Research Assistant Agent.
 Defines the graph structure, conditional edges, and execution flow.
 """
 
+import asyncio
+import contextlib
+import functools
+import inspect
+import itertools
 import os
-from datetime import datetime
-from typing import Dict, Any, Literal
+import time
+from typing import Dict, Any, AsyncIterator, FrozenSet, NamedTuple, Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 
-from .state import ResearchState
+from .state import ResearchState, report_query_name
 from .nodes import ResearchNodes, create_initial_state
-from .config import Config
+from .config import Config, workflow_logger
+
+class Route(NamedTuple):
+    """How to leave a node; a retry goes through reflexion while retries remain."""
+    success_step: str
+    next_node: str
+    # State key that must be truthy to move on after success
+    required: Optional[str]
+    # Steps after which to retry
+    retry_steps: FrozenSet[str]
+    # Also retry after any other step when the required key is falsy (unsafe output)
+    require_always: bool = False
+
+
+# Routing after each node
+ROUTES = {
+    "plan": Route("planning_complete", "search", None, frozenset({"planning_failed"})),
+    "search": Route("search_complete", "validate", "sources", frozenset({"search_failed"})),
+    "validate": Route("validation_complete", "synthesize", "sources", frozenset({"validation_failed"})),
+    "synthesize": Route("synthesis_complete", "safety", None, frozenset({"synthesis_failed"})),
+    "safety": Route("completed", "end", "is_safe", frozenset({"safety_failed", "safety_validation_failed"}), True),
+    "reflexion": Route("retry_planning", "plan", None, frozenset()),
+}
+
+# State models stored in checkpoints, allowed back out of msgpack without the unregistered-type path
+CHECKPOINT_TYPES = [("src.state", "SearchResult"), ("src.state", "SafetyCheck")]
+
+# On-disk checkpoint database used by the CLI, inside Config.CHECKPOINT_PATH
+CHECKPOINT_DB = "checkpoints.sqlite"
+
+
+def _checkpoint_serde() -> JsonPlusSerializer:
+    """Build the checkpoint serializer, registering CHECKPOINT_TYPES where supported."""
+    # allowed_msgpack_modules only exists in recent langgraph-checkpoint releases;
+    # older ones deserialize these types without it
+    if "allowed_msgpack_modules" in inspect.signature(JsonPlusSerializer).parameters:
+        return JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+    return JsonPlusSerializer()
+
+
+@contextlib.asynccontextmanager
+async def persistent_checkpointer() -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    """
+    Open the on-disk checkpointer so --history and --resume work across runs.
+    
+    Yields None when checkpointing is disabled or langgraph-checkpoint-sqlite
+    is not installed; the workflow then falls back to the in-memory saver.
+    """
+    if not Config.CHECKPOINT_ENABLED:
+        yield None
+        return
+    
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        yield None
+        return
+    
+    os.makedirs(Config.CHECKPOINT_PATH, exist_ok=True)
+    # aiosqlite runs the connection on its own thread, so checkpoint writes
+    # after each node never block the event loop
+    async with aiosqlite.connect(os.path.join(Config.CHECKPOINT_PATH, CHECKPOINT_DB)) as conn:
+        yield AsyncSqliteSaver(conn, serde=_checkpoint_serde())
 
 
 class ResearchWorkflow:
     """Main workflow orchestrator using LangGraph."""
     
-    def __init__(self):
+    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None):
         self.nodes = ResearchNodes()
-        self.checkpointer = MemorySaver() if Config.CHECKPOINT_ENABLED else None
+        if checkpointer is None and Config.CHECKPOINT_ENABLED:
+            checkpointer = MemorySaver(serde=_checkpoint_serde())
+        self.checkpointer = checkpointer
         self.graph = self._build_graph()
+        
+        # Timestamp of the last saved report; reports in the same second get a sequence suffix
+        self._report_second = 0
+        self._report_stamp = ""
+        self._report_seq = itertools.count(1)
     
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph workflow."""
@@ -40,159 +117,30 @@ class ResearchWorkflow:
         workflow.set_entry_point("plan")
         
         # Add conditional edges
-        workflow.add_conditional_edges(
-            "plan",
-            self._route_after_planning,
-            {
-                "search": "search",
-                "reflexion": "reflexion",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "search",
-            self._route_after_search,
-            {
-                "validate": "validate",
-                "reflexion": "reflexion",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "validate",
-            self._route_after_validation,
-            {
-                "synthesize": "synthesize",
-                "reflexion": "reflexion",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "synthesize",
-            self._route_after_synthesis,
-            {
-                "safety": "safety",
-                "reflexion": "reflexion",
-                "end": END
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "safety",
-            self._route_after_safety,
-            {
-                "end": END,
-                "reflexion": "reflexion"
-            }
-        )
-        
-        workflow.add_conditional_edges(
-            "reflexion",
-            self._route_after_reflexion,
-            {
-                "plan": "plan",
-                "end": END
-            }
-        )
+        for node, route in ROUTES.items():
+            path_map = {route.next_node: END if route.next_node == "end" else route.next_node, "end": END}
+            if route.required or route.retry_steps:
+                path_map["reflexion"] = "reflexion"
+            workflow.add_conditional_edges(node, functools.partial(self._route, route), path_map)
         
         return workflow.compile(checkpointer=self.checkpointer)
     
-    def _route_after_planning(self, state: ResearchState) -> Literal["search", "reflexion", "end"]:
-        """Route after planning step."""
-        current_step = state.get('current_step', '')
-        
-        if current_step == 'planning_complete':
-            return "search"
-        elif current_step == 'planning_failed':
-            if state['retry_count'] < state['max_retries']:
-                return "reflexion"
-            else:
-                return "end"
-        else:
-            return "end"
-    
-    def _route_after_search(self, state: ResearchState) -> Literal["validate", "reflexion", "end"]:
-        """Route after search step."""
-        current_step = state.get('current_step', '')
-        
-        if current_step == 'search_complete':
-            if state.get('sources', []):
-                return "validate"
-            else:
-                # No sources found, try reflexion
-                if state['retry_count'] < state['max_retries']:
-                    return "reflexion"
-                else:
-                    return "end"
-        elif current_step == 'search_failed':
-            if state['retry_count'] < state['max_retries']:
-                return "reflexion"
-            else:
-                return "end"
-        else:
-            return "end"
-    
-    def _route_after_validation(self, state: ResearchState) -> Literal["synthesize", "reflexion", "end"]:
-        """Route after validation step."""
-        current_step = state.get('current_step', '')
-        
-        if current_step == 'validation_complete':
-            if state.get('sources', []):
-                return "synthesize"
-            else:
-                # All sources filtered out
-                if state['retry_count'] < state['max_retries']:
-                    return "reflexion"
-                else:
-                    return "end"
-        elif current_step == 'validation_failed':
-            if state['retry_count'] < state['max_retries']:
-                return "reflexion"
-            else:
-                return "end"
-        else:
-            return "end"
-    
-    def _route_after_synthesis(self, state: ResearchState) -> Literal["safety", "reflexion", "end"]:
-        """Route after synthesis step."""
-        current_step = state.get('current_step', '')
-        
-        if current_step == 'synthesis_complete':
-            return "safety"
-        elif current_step == 'synthesis_failed':
-            if state['retry_count'] < state['max_retries']:
-                return "reflexion"
-            else:
-                return "end"
-        else:
-            return "end"
-    
-    def _route_after_safety(self, state: ResearchState) -> Literal["end", "reflexion"]:
-        """Route after safety validation."""
+    def _route(self, route: Route, state: ResearchState) -> str:
+        """Route after a node; ``route`` is its entry in ROUTES, bound per edge."""
         current_step = state.get('current_step', '')
-        is_safe = state.get('is_safe', False)
         
-        if current_step == 'completed' and is_safe:
-            return "end"
-        elif current_step in ['safety_failed', 'safety_validation_failed'] or not is_safe:
-            if state['retry_count'] < state['max_retries']:
-                return "reflexion"
-            else:
-                return "end"
-        else:
+        if current_step == route.success_step:
+            if route.required is None or state.get(route.required):
+                return route.next_node
+        elif current_step not in route.retry_steps and not (
+            route.require_always and not state.get(route.required)
+        ):
             return "end"
-    
-    def _route_after_reflexion(self, state: ResearchState) -> Literal["plan", "end"]:
-        """Route after reflexion step."""
-        current_step = state.get('current_step', '')
         
-        if current_step == 'retry_planning':
-            return "plan"
-        else:
-            return "end"
+        # Failed, or finished without the required sources / safe output
+        if state['retry_count'] < state['max_retries']:
+            return "reflexion"
+        return "end"
     
     async def run_research(self, query: str, thread_id: str = None) -> ResearchState:
         """
@@ -205,8 +153,8 @@ class ResearchWorkflow:
         Returns:
             Final research state
         """
-        print(f"Starting research workflow for: '{query}'")
-        print("=" * 60)
+        workflow_logger.info(f"Starting research workflow for: '{query}'")
+        workflow_logger.info("=" * 60)
         
         # Create initial state
         initial_state = create_initial_state(query)
@@ -223,56 +171,68 @@ class ResearchWorkflow:
             
             # Save report to markdown file if completed successfully
             if final_state['current_step'] == 'completed' and final_state.get('draft'):
-                self._save_report_to_file(final_state, thread_id)
+                await self._save_report_to_file(final_state, thread_id)
             
             return final_state
             
         except Exception as e:
-            print(f"ERROR: Workflow execution failed: {e}")
+            workflow_logger.error(f"ERROR: Workflow execution failed: {e}")
             initial_state['errors'].append(f"Workflow execution failed: {str(e)}")
             initial_state['current_step'] = 'workflow_failed'
             return initial_state
     
     def _print_results(self, state: ResearchState):
         """Print workflow results."""
-        print("\n" + "=" * 60)
-        print("RESEARCH WORKFLOW RESULTS")
-        print("=" * 60)
+        get = state.get
+        rule = "=" * 60
+        errors = get('errors')
+        warnings = get('warnings')
+        draft = get('draft')
         
-        print(f"Query: {state['research_query']}")
-        print(f"Status: {state['current_step']}")
-        print(f"Retries: {state['retry_count']}/{state['max_retries']}")
-        print(f"Safety: {'Safe' if state['is_safe'] else 'Unsafe'}")
-        print(f"Sources: {len(state.get('sources', []))}")
+        # Collected and written in one call rather than one print per line
+        lines = [
+            "\n" + rule,
+            "RESEARCH WORKFLOW RESULTS",
+            rule,
+            f"Query: {state['research_query']}",
+            f"Status: {state['current_step']}",
+            f"Retries: {state['retry_count']}/{state['max_retries']}",
+            f"Safety: {'Safe' if state['is_safe'] else 'Unsafe'}",
+            f"Sources: {len(get('sources', ()))}",
+        ]
         
-        if state.get('errors'):
-            print(f"Errors: {len(state['errors'])}")
-            for error in state['errors'][-3:]:  # Show last 3 errors
-                print(f"   - {error}")
+        if errors:
+            lines.append(f"Errors: {len(errors)}")
+            lines.extend(f"   - {error}" for error in errors[-3:])  # Show last 3 errors
         
-        if state.get('warnings'):
-            print(f"Warnings: {len(state['warnings'])}")
-            for warning in state['warnings'][-3:]:  # Show last 3 warnings
-                print(f"   - {warning}")
+        if warnings:
+            lines.append(f"Warnings: {len(warnings)}")
+            lines.extend(f"   - {warning}" for warning in warnings[-3:])  # Show last 3 warnings
         
-        if state.get('draft') and state['current_step'] == 'completed':
-            print("\nRESEARCH RESULTS:")
-            print("-" * 40)
-            print(state['draft'])
+        if draft and state['current_step'] == 'completed':
+            lines += ["\nRESEARCH RESULTS:", "-" * 40, draft]
         
-        print("\n" + "=" * 60)
+        lines.append("\n" + rule)
+        workflow_logger.info("\n".join(lines))
+    
+    def _report_timestamp(self) -> str:
+        """Get the timestamp part of a report filename, unique within this workflow."""
+        now = int(time.time())
+        if now != self._report_second:
+            self._report_second = now
+            self._report_stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+            self._report_seq = itertools.count(1)
+            return self._report_stamp
+        return f"{self._report_stamp}_{next(self._report_seq)}"
     
-    def _save_report_to_file(self, state: ResearchState, thread_id: str = None):
+    async def _save_report_to_file(self, state: ResearchState, thread_id: str = None):
         """Save the research report to a markdown file."""
         try:
-            # Create reports directory if it doesn't exist
             reports_dir = "reports"
-            os.makedirs(reports_dir, exist_ok=True)
             
             # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            query_safe = "".join(c for c in state['research_query'][:50] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            query_safe = query_safe.replace(' ', '_')
+            timestamp = self._report_timestamp()
+            query_safe = report_query_name(state['research_query'])
             
             if thread_id:
                 filename = f"{timestamp}_{thread_id}_{query_safe}.md"
@@ -280,37 +240,43 @@ class ResearchWorkflow:
                 filename = f"{timestamp}_{query_safe}.md"
             
             filepath = os.path.join(reports_dir, filename)
+            draft = state['draft']
             
-            # Write the report to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(state['draft'])
+            def write_report():
+                # Create reports directory if it doesn't exist
+                os.makedirs(reports_dir, exist_ok=True)
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(draft)
             
-            print(f"\nReport saved to: {filepath}")
+            # Write the report on a worker thread so the event loop keeps running
+            await asyncio.to_thread(write_report)
+            
+            workflow_logger.info(f"\nReport saved to: {filepath}")
             
         except Exception as e:
-            print(f"WARNING: Failed to save report to file: {e}")
+            workflow_logger.warning(f"WARNING: Failed to save report to file: {e}")
     
-    async def get_state_history(self, thread_id: str) -> list:
-        """Get execution history for a thread."""
+    async def iter_state_history(self, thread_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield execution history entries for a thread, newest first."""
         if not self.checkpointer:
-            return []
+            return
         
+        config = {"configurable": {"thread_id": thread_id}}
+        async for checkpoint in self.graph.aget_state_history(config):
+            values = checkpoint.values
+            yield {
+                "step": values.get('current_step', 'unknown'),
+                "timestamp": values.get('timestamp', ''),
+                "errors": len(values.get('errors', ())),
+                "sources": len(values.get('sources', ()))
+            }
+    
+    async def get_state_history(self, thread_id: str) -> list:
+        """Get execution history for a thread."""
         try:
-            config = {"configurable": {"thread_id": thread_id}}
-            history = []
-            
-            async for checkpoint in self.graph.aget_state_history(config):
-                history.append({
-                    "step": checkpoint.values.get('current_step', 'unknown'),
-                    "timestamp": checkpoint.values.get('timestamp', ''),
-                    "errors": len(checkpoint.values.get('errors', [])),
-                    "sources": len(checkpoint.values.get('sources', []))
-                })
-            
-            return history
-            
+            return [entry async for entry in self.iter_state_history(thread_id)]
         except Exception as e:
-            print(f"Error retrieving history: {e}")
+            workflow_logger.error(f"Error retrieving history: {e}")
             return []
     
     async def resume_from_checkpoint(self, thread_id: str) -> ResearchState:
@@ -327,7 +293,7 @@ class ResearchWorkflow:
             if not current_state.values:
                 raise ValueError(f"No checkpoint found for thread {thread_id}")
             
-            print(f"Resuming from step: {current_state.values.get('current_step', 'unknown')}")
+            workflow_logger.info(f"Resuming from step: {current_state.values.get('current_step', 'unknown')}")
             
             # Resume execution
             final_state = await self.graph.ainvoke(None, config=config)
@@ -336,10 +302,28 @@ class ResearchWorkflow:
             return final_state
             
         except Exception as e:
-            print(f"ERROR: Resume failed: {e}")
+            workflow_logger.error(f"ERROR: Resume failed: {e}")
             raise
 
 
+# Shared workflow instance, built on first use
+_workflow: Optional[ResearchWorkflow] = None
+
+
+def get_workflow() -> ResearchWorkflow:
+    """Get the shared workflow, building and compiling the graph on first call."""
+    global _workflow
+    if _workflow is None:
+        _workflow = ResearchWorkflow()
+    return _workflow
+
+
+def reset_workflow():
+    """Drop the shared workflow so the next call builds a fresh one."""
+    global _workflow
+    _workflow = None
+
+
 # Convenience function for direct usage
 async def research_query(query: str, thread_id: str = None) -> ResearchState:
     """
@@ -352,5 +336,4 @@ async def research_query(query: str, thread_id: str = None) -> ResearchState:
     Returns:
         Research results state
     """
-    workflow = ResearchWorkflow()
-    return await workflow.run_research(query, thread_id)
\ No newline at end of file
+    return await get_workflow().run_research(query, thread_id)
\ No newline at end of file
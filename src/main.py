@@ -8,12 +8,11 @@ import argparse
 import sys
 from typing import Optional
 
-from .graph import ResearchWorkflow, research_query
 from .config import Config
 
 
-async def main():
-    """Main application entry point."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
     parser = argparse.ArgumentParser(
         description="Research Assistant Agent with LangGraph & Gemini 2.0 Flash"
     )
@@ -52,16 +51,26 @@ async def main():
         help="Save research report to markdown file (default: auto-save on completion)"
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+def show_config():
+    """Print the current (non-sensitive) configuration."""
+    print("Current Configuration:")
+    print("-" * 30)
+    config = Config.get_safe_config()
+    for key, value in config.items():
+        print(f"{key}: {value}")
+    print(f"config_valid: {Config.validate_config()}")
+
+
+async def main():
+    """Main application entry point."""
+    args = build_parser().parse_args()
     
     # Show configuration if requested
     if args.config:
-        print("Current Configuration:")
-        print("-" * 30)
-        config = Config.get_safe_config()
-        for key, value in config.items():
-            print(f"{key}: {value}")
-        print(f"config_valid: {Config.validate_config()}")
+        show_config()
         return
     
     # Validate configuration
@@ -70,9 +79,17 @@ async def main():
         print("Please check your API keys in environment variables or .env file")
         sys.exit(1)
     
-    # Create workflow
-    workflow = ResearchWorkflow()
+    # LangGraph and the LLM clients load only once the arguments are valid
+    from .graph import ResearchWorkflow, persistent_checkpointer
     
+    async with persistent_checkpointer() as checkpointer:
+        # Create workflow
+        workflow = ResearchWorkflow(checkpointer)
+        await run_cli(args, workflow)
+
+
+async def run_cli(args, workflow):
+    """Run the requested CLI action against a workflow."""
     try:
         if args.history and args.thread_id:
             # Show execution history
@@ -104,7 +121,7 @@ async def main():
             # Manual save if requested (auto-save already happens in workflow)
             if args.save_report and result['current_step'] == 'completed' and result.get('draft'):
                 print("\nManual save requested (note: auto-save already occurred)")
-                workflow._save_report_to_file(result, args.thread_id)
+                await workflow._save_report_to_file(result, args.thread_id)
             
             # Show final status
             if result['current_step'] == 'completed' and result['is_safe']:
@@ -127,6 +144,8 @@ async def main():
 
 async def example_usage():
     """Example usage of the research agent."""
+    from .graph import research_query
+    
     print("Running Example Research Queries")
     print("=" * 50)
     
@@ -158,8 +177,10 @@ async def example_usage():
 
 
 if __name__ == "__main__":
-    # Check if running examples
-    if len(sys.argv) == 2 and sys.argv[1] == "--examples":
+    # Flag-only commands skip building the parser (and --config needs no query)
+    if sys.argv[1:] == ["--examples"]:
         asyncio.run(example_usage())
+    elif sys.argv[1:] == ["--config"]:
+        show_config()
     else:
         asyncio.run(main())
\ No newline at end of file
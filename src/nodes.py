@@ -4,34 +4,77 @@ Implements the ReAct pattern with planning, searching, validation, synthesis, an
 """
 
 import asyncio
+import functools
+import heapq
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List
 import uuid
 
 from .state import ResearchState, SearchResult, SafetyCheck
-from .tools import TavilySearchTool, GeminiLLM
 from .safety import SafetyValidator
-from .config import Config
+from .config import Config, workflow_logger
+
+if TYPE_CHECKING:
+    from .tools import TavilySearchTool, GeminiLLM
 
 
 class ResearchNodes:
     """Collection of nodes for the research workflow."""
     
-    def __init__(self):
-        self.search_tool = TavilySearchTool(Config.TAVILY_API_KEY)
-        self.llm = GeminiLLM(Config.GEMINI_API_KEY)
-        self.safety_validator = SafetyValidator()
+    # Clients are created on first use, so building the graph (e.g. for --history)
+    # does not import the Tavily and Gemini SDKs or open their sessions
+    
+    @functools.cached_property
+    def search_tool(self) -> "TavilySearchTool":
+        from .tools import TavilySearchTool
+        return TavilySearchTool(Config.TAVILY_API_KEY)
+    
+    @functools.cached_property
+    def llm(self) -> "GeminiLLM":
+        from .tools import GeminiLLM
+        return GeminiLLM(Config.GEMINI_API_KEY)
+    
+    @functools.cached_property
+    def safety_validator(self) -> SafetyValidator:
+        return SafetyValidator()
     
     async def plan_node(self, state: ResearchState) -> ResearchState:
         """
         Planning node: Creates research plan and search strategy.
         First step in the ReAct workflow.
         """
-        print(f"Planning research for: {state['research_query']}")
+        workflow_logger.info(f"Planning research for: {state['research_query']}")
         
         try:
-            # Generate research plan using LLM
-            planning_output = await self.llm.generate_plan(state['research_query'])
+            # Generate research plan using LLM; a retry after reflexion always asks for a fresh one
+            first_attempt = state['retry_count'] == 0
+            plan = self.llm.generate_plan(state['research_query'], use_cache=first_attempt)
+            
+            speculative_sources = []
+            if first_attempt:
+                # The raw query is searched meanwhile, so its results are ready for search_node.
+                # Retries follow a revised plan and skip this extra paid search.
+                searched, planning_output = await asyncio.gather(
+                    self.search_tool.search(
+                        query=state['research_query'],
+                        max_results=Config.MAX_SEARCH_RESULTS // 2
+                    ),
+                    plan,
+                    return_exceptions=True
+                )
+                if isinstance(planning_output, BaseException):
+                    raise planning_output
+                
+                # A failed search only costs the head start; search_node runs the query again
+                if isinstance(searched, Exception):
+                    workflow_logger.warning(f"WARNING: Speculative search failed: {searched}")
+                elif isinstance(searched, BaseException):
+                    raise searched
+                else:
+                    speculative_sources = searched
+            else:
+                planning_output = await plan
+            state['speculative_sources'] = speculative_sources
             
             # Update state
             state['plan'] = planning_output.research_plan
@@ -41,13 +84,13 @@ class ResearchNodes:
             # Store search queries for next step
             state['search_queries'] = planning_output.search_queries
             
-            print(f"Plan created: {planning_output.research_plan[:100]}...")
+            workflow_logger.info(f"Plan created: {planning_output.research_plan[:100]}...")
             
         except Exception as e:
             error_msg = f"Planning failed: {str(e)}"
             state['errors'].append(error_msg)
             state['current_step'] = 'planning_failed'
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
     
@@ -56,41 +99,52 @@ class ResearchNodes:
         Search node: Executes search queries and gathers sources.
         Acting component of ReAct pattern.
         """
-        print(f"Searching for information...")
+        workflow_logger.info(f"Searching for information...")
         
         try:
-            all_results = []
-            search_queries = state.get('search_queries', [state['research_query']])
+            # Start from the raw-query results fetched during planning
+            all_results = list(state.get('speculative_sources') or ())
+            state['speculative_sources'] = []
+            search_queries = state.get('search_queries') or [state['research_query']]
             
-            # Execute multiple search queries
-            for query in search_queries[:3]:  # Limit to 3 queries
-                print(f"  Searching: {query}")
-                results = await self.search_tool.search(
-                    query=query, 
-                    max_results=Config.MAX_SEARCH_RESULTS // len(search_queries)
-                )
+            # Execute multiple search queries concurrently, skipping the raw query if already searched
+            queries = [
+                query for query in search_queries[:3]  # Limit to 3 queries
+                if not (all_results and query == state['research_query'])
+            ]
+            for query in queries:
+                workflow_logger.info(f"  Searching: {query}")
+            
+            # Split the result budget over the queries actually run
+            per_query = max(1, Config.MAX_SEARCH_RESULTS // max(1, len(queries)))
+            results_lists = await self.search_tool.search_many(queries, max_results=per_query)
+            
+            for query, results in zip(queries, results_lists):
+                if isinstance(results, Exception):
+                    state['errors'].append(f"Search for '{query}' failed: {str(results)}")
+                    continue
                 all_results.extend(results)
             
-            # Remove duplicates based on URL
-            unique_results = []
-            seen_urls = set()
+            # Remove duplicates based on URL, keeping the best-scored copy
+            best_results: Dict[str, SearchResult] = {}
             for result in all_results:
-                if result.url not in seen_urls:
-                    unique_results.append(result)
-                    seen_urls.add(result.url)
+                previous = best_results.get(result.url)
+                if previous is None or result.score > previous.score:
+                    best_results[result.url] = result
             
-            # Sort by score and take top results
-            unique_results.sort(key=lambda x: x.score, reverse=True)
-            state['sources'] = unique_results[:Config.MAX_SEARCH_RESULTS]
+            # Take top results by score
+            state['sources'] = heapq.nlargest(
+                Config.MAX_SEARCH_RESULTS, best_results.values(), key=lambda x: x.score
+            )
             
             state['current_step'] = 'search_complete'
-            print(f"Found {len(state['sources'])} sources")
+            workflow_logger.info(f"Found {len(state['sources'])} sources")
             
         except Exception as e:
             error_msg = f"Search failed: {str(e)}"
             state['errors'].append(error_msg)
             state['current_step'] = 'search_failed'
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
     
@@ -99,35 +153,40 @@ class ResearchNodes:
         Validation node: Validates sources for safety and reliability.
         Safety layer in the workflow.
         """
-        print(f"Validating {len(state['sources'])} sources...")
+        workflow_logger.info(f"Validating {len(state['sources'])} sources...")
         
         try:
-            # Validate all search results
-            safety_checks = self.safety_validator.validate_search_results(state['sources'])
+            # Validate all search results: URL, content and title checks per source
+            sources = state['sources']
+            url_checks, content_checks, title_checks = self.safety_validator.check_search_results(sources)
             
             # Filter safe sources
             safe_sources = []
-            for i, source in enumerate(state['sources']):
-                # Get safety checks for this source (URL + content + title)
-                source_checks = safety_checks[i*3:(i+1)*3]  # 3 checks per source
-                aggregated_check = self.safety_validator.aggregate_safety_checks(source_checks)
-                
-                if aggregated_check.is_safe:
+            for source, url_check, content_check, title_check in zip(
+                sources, url_checks, content_checks, title_checks
+            ):
+                if url_check.is_safe and content_check.is_safe and title_check.is_safe:
                     safe_sources.append(source)
                 else:
-                    print(f"  WARNING: Filtered unsafe source: {source.url}")
+                    workflow_logger.warning(f"  WARNING: Filtered unsafe source: {source.url}")
+            
+            safety_checks = [
+                check
+                for checks in zip(url_checks, content_checks, title_checks)
+                for check in checks
+            ]
             
             state['sources'] = safe_sources
             state['safety_checks'] = safety_checks
             state['current_step'] = 'validation_complete'
             
-            print(f"Validated sources: {len(safe_sources)} safe sources")
+            workflow_logger.info(f"Validated sources: {len(safe_sources)} safe sources")
             
         except Exception as e:
             error_msg = f"Validation failed: {str(e)}"
             state['errors'].append(error_msg)
             state['current_step'] = 'validation_failed'
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
     
@@ -136,7 +195,7 @@ class ResearchNodes:
         Synthesis node: Synthesizes research findings into coherent output.
         Reasoning component of ReAct pattern.
         """
-        print(f"Synthesizing research from {len(state['sources'])} sources...")
+        workflow_logger.info(f"Synthesizing research from {len(state['sources'])} sources...")
         
         try:
             if not state['sources']:
@@ -148,38 +207,39 @@ class ResearchNodes:
                 state['sources']
             )
             
-            # Create comprehensive draft
-            draft = f"""# Research Summary: {state['research_query']}
-
-## Overview
-{synthesis_output.research_summary}
-
-## Key Findings
-{chr(10).join(f"• {finding}" for finding in synthesis_output.key_findings)}
-
-## Sources
-{chr(10).join(f"• {source}" for source in synthesis_output.sources_used)}
-
-## Confidence Level
-{synthesis_output.confidence_level:.2f} (out of 1.0)
-
-## Recommendations
-{chr(10).join(f"• {rec}" for rec in synthesis_output.recommendations)}
-
----
-*Research completed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
-"""
-            
-            state['draft'] = draft
+            # Create comprehensive draft from its lines, joined once
+            # (an empty section still leaves its blank line)
+            state['draft'] = "\n".join([
+                f"# Research Summary: {state['research_query']}",
+                "",
+                "## Overview",
+                synthesis_output.research_summary,
+                "",
+                "## Key Findings",
+                _bullets(synthesis_output.key_findings),
+                "",
+                "## Sources",
+                _bullets(synthesis_output.sources_used),
+                "",
+                "## Confidence Level",
+                f"{synthesis_output.confidence_level:.2f} (out of 1.0)",
+                "",
+                "## Recommendations",
+                _bullets(synthesis_output.recommendations),
+                "",
+                "---",
+                f"*Research completed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*",
+                "",
+            ])
             state['current_step'] = 'synthesis_complete'
             
-            print(f"Research synthesized (confidence: {synthesis_output.confidence_level:.2f})")
+            workflow_logger.info(f"Research synthesized (confidence: {synthesis_output.confidence_level:.2f})")
             
         except Exception as e:
             error_msg = f"Synthesis failed: {str(e)}"
             state['errors'].append(error_msg)
             state['current_step'] = 'synthesis_failed'
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
     
@@ -188,7 +248,7 @@ class ResearchNodes:
         Safety node: Final safety validation of the complete output.
         Final safety check before completion.
         """
-        print(f"Final safety validation...")
+        workflow_logger.info(f"Final safety validation...")
         
         try:
             # Validate final output
@@ -199,10 +259,10 @@ class ResearchNodes:
             
             if final_check.is_safe:
                 state['current_step'] = 'completed'
-                print(f"Research completed safely")
+                workflow_logger.info(f"Research completed safely")
             else:
                 state['current_step'] = 'safety_failed'
-                print(f"WARNING: Safety validation failed: {final_check.reason}")
+                workflow_logger.warning(f"WARNING: Safety validation failed: {final_check.reason}")
                 
                 # Add flagged content to warnings
                 if final_check.flagged_content:
@@ -213,7 +273,7 @@ class ResearchNodes:
             state['errors'].append(error_msg)
             state['current_step'] = 'safety_validation_failed'
             state['is_safe'] = False
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
     
@@ -222,7 +282,7 @@ class ResearchNodes:
         Reflexion node: Analyzes failures and suggests improvements.
         Self-improvement component for failed attempts.
         """
-        print(f"Performing reflexion on failed attempt...")
+        workflow_logger.info(f"Performing reflexion on failed attempt...")
         
         try:
             # Prepare context for reflexion
@@ -248,20 +308,25 @@ class ResearchNodes:
             if reflexion_output.should_retry and state['retry_count'] < state['max_retries']:
                 state['retry_count'] += 1
                 state['current_step'] = 'retry_planning'
-                print(f"Retry {state['retry_count']}/{state['max_retries']} - {reflexion_output.critique[:100]}...")
+                workflow_logger.info(f"Retry {state['retry_count']}/{state['max_retries']} - {reflexion_output.critique[:100]}...")
             else:
                 state['current_step'] = 'max_retries_reached'
-                print(f"Max retries reached or retry not recommended")
+                workflow_logger.info(f"Max retries reached or retry not recommended")
             
         except Exception as e:
             error_msg = f"Reflexion failed: {str(e)}"
             state['errors'].append(error_msg)
             state['current_step'] = 'reflexion_failed'
-            print(f"ERROR: {error_msg}")
+            workflow_logger.error(f"ERROR: {error_msg}")
         
         return state
 
 
+def _bullets(items: List[str]) -> str:
+    """Format items as a bulleted markdown list."""
+    return "\n".join([f"• {item}" for item in items])
+
+
 def create_initial_state(research_query: str) -> ResearchState:
     """Create initial state for the research workflow."""
     return ResearchState(
@@ -280,5 +345,6 @@ def create_initial_state(research_query: str) -> ResearchState:
         request_id=str(uuid.uuid4()),
         errors=[],
         warnings=[],
-        search_queries=[]
+        search_queries=[],
+        speculative_sources=[]
     )
\ No newline at end of file
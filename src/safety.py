@@ -5,15 +5,27 @@ Implements content moderation, URL validation, and rate limiting.
 
 import time
 import asyncio
-from typing import List, Dict, Any, Optional
-from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
 import re
 from dataclasses import dataclass
 from threading import Lock
+from collections import OrderedDict
 
 from .config import Config
 from .state import SafetyCheck, SearchResult
 
+try:
+    import ahocorasick
+except ImportError:  # optional, only used for long keyword lists
+    ahocorasick = None
+
+# Moderation results kept per chain, least recently used evicted first
+MODERATION_CACHE_SIZE = 1024
+
+# Below this many blocked keywords, per-keyword substring search beats an automaton
+AHOCORASICK_MIN_KEYWORDS = 25
+
 
 class TokenBucket:
     """Token bucket implementation for rate limiting."""
@@ -22,13 +34,13 @@ class TokenBucket:
         self.capacity = capacity
         self.tokens = capacity
         self.refill_rate = refill_rate
-        self.last_refill = time.time()
+        self.last_refill = time.monotonic()
         self.lock = Lock()
     
     def consume(self, tokens: int = 1) -> bool:
         """Attempt to consume tokens. Returns True if successful."""
         with self.lock:
-            now = time.time()
+            now = time.monotonic()
             # Add tokens based on time passed
             tokens_to_add = (now - self.last_refill) * self.refill_rate
             self.tokens = min(self.capacity, self.tokens + tokens_to_add)
@@ -52,31 +64,31 @@ class URLValidator:
     """Validates URLs against whitelist and safety criteria."""
     
     def __init__(self, trusted_domains: set):
-        self.trusted_domains = trusted_domains
+        self.trusted_domains = frozenset(trusted_domains)
+        self._subdomain_suffixes = tuple('.' + trusted for trusted in self.trusted_domains)
     
     def is_trusted_domain(self, url: str) -> bool:
         """Check if URL belongs to a trusted domain."""
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            
-            # Remove www. prefix
-            if domain.startswith('www.'):
-                domain = domain[4:]
-            
-            # Check exact match or subdomain
-            for trusted in self.trusted_domains:
-                if domain == trusted or domain.endswith('.' + trusted):
-                    return True
-            
-            return False
+            return self._is_trusted_netloc(urlsplit(url).netloc)
         except Exception:
             return False
     
+    def _is_trusted_netloc(self, netloc: str) -> bool:
+        """Check a URL's network location against the trusted domains."""
+        domain = netloc.lower()
+        
+        # Remove www. prefix
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        
+        # Exact match or subdomain
+        return domain in self.trusted_domains or domain.endswith(self._subdomain_suffixes)
+    
     def validate_url(self, url: str) -> SafetyCheck:
         """Comprehensive URL validation."""
         try:
-            parsed = urlparse(url)
+            parsed = urlsplit(url)
             
             # Basic URL structure validation
             if not parsed.scheme or not parsed.netloc:
@@ -97,7 +109,7 @@ class URLValidator:
                 )
             
             # Domain trust validation
-            is_trusted = self.is_trusted_domain(url)
+            is_trusted = self._is_trusted_netloc(parsed.netloc)
             confidence = 0.9 if is_trusted else 0.3
             
             return SafetyCheck(
@@ -127,6 +139,21 @@ class ContentModerationChain:
             r'\b(?:hate|racist|discrimination)\b',
             r'\b(?:explicit|adult|nsfw|porn)\b'
         ]
+        # Long keyword lists are matched in one pass by an Aho-Corasick automaton
+        self._keyword_automaton = None
+        keywords = set(self.blocked_keywords)
+        if ahocorasick is not None and len(keywords) >= AHOCORASICK_MIN_KEYWORDS and "" not in keywords:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._keyword_automaton.add_word(keyword, keyword)
+            self._keyword_automaton.make_automaton()
+        
+        # One scan for all patterns; content is lowercased before matching
+        self._suspicious_re = re.compile("|".join(f"(?:{p})" for p in self.suspicious_patterns))
+        
+        # Repeated snippets and titles across queries are moderated once; only
+        # the flagged terms are kept so every caller gets its own SafetyCheck
+        self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
     
     def moderate_content(self, content: str) -> SafetyCheck:
         """Moderate content for safety violations."""
@@ -137,20 +164,16 @@ class ContentModerationChain:
                 confidence=1.0
             )
         
-        content_lower = content.lower()
-        flagged_content = []
-        
-        # Check blocked keywords
-        for keyword in self.blocked_keywords:
-            if keyword in content_lower:
-                flagged_content.append(keyword)
+        flagged = self._cache.get(content)
+        if flagged is not None:
+            self._cache.move_to_end(content)
+        else:
+            flagged = self._find_flagged(content)
+            self._cache[content] = flagged
+            if len(self._cache) > MODERATION_CACHE_SIZE:
+                self._cache.popitem(last=False)
         
-        # Check suspicious patterns
-        for pattern in self.suspicious_patterns:
-            matches = re.findall(pattern, content_lower, re.IGNORECASE)
-            flagged_content.extend(matches)
-        
-        is_safe = len(flagged_content) == 0
+        is_safe = len(flagged) == 0
         confidence = 0.8 if is_safe else 0.9
         reason = "Content passed moderation" if is_safe else "Content flagged for review"
         
@@ -158,8 +181,24 @@ class ContentModerationChain:
             is_safe=is_safe,
             reason=reason,
             confidence=confidence,
-            flagged_content=flagged_content
+            flagged_content=list(flagged)
         )
+    
+    def _find_flagged(self, content: str) -> Tuple[str, ...]:
+        """Return the blocked keywords and suspicious patterns found in content."""
+        content_lower = content.lower()
+        
+        # Check blocked keywords; for short lists str's substring search is
+        # faster than any single-pass matcher
+        if self._keyword_automaton is not None:
+            found = {kw for _, kw in self._keyword_automaton.iter(content_lower)}
+            flagged_content = [kw for kw in self.blocked_keywords if kw in found]
+        else:
+            flagged_content = [kw for kw in self.blocked_keywords if kw in content_lower]
+        
+        # Check suspicious patterns
+        flagged_content.extend(self._suspicious_re.findall(content_lower))
+        return tuple(flagged_content)
 
 
 class SafetyValidator:
@@ -173,24 +212,25 @@ class SafetyValidator:
             refill_rate=Config.RATE_LIMIT_REQUESTS_PER_MINUTE / 60.0
         )
     
-    def validate_search_results(self, results: List[SearchResult]) -> List[SafetyCheck]:
-        """Validate a list of search results."""
-        safety_checks = []
-        
-        for result in results:
-            # URL validation
-            url_check = self.url_validator.validate_url(result.url)
-            safety_checks.append(url_check)
-            
-            # Content moderation
-            content_check = self.content_moderator.moderate_content(result.content)
-            safety_checks.append(content_check)
-            
-            # Title moderation
-            title_check = self.content_moderator.moderate_content(result.title)
-            safety_checks.append(title_check)
+    def check_search_results(
+        self,
+        results: List[SearchResult]
+    ) -> Tuple[List[SafetyCheck], List[SafetyCheck], List[SafetyCheck]]:
+        """Validate search results, returning parallel (url, content, title) check lists."""
+        moderate = self.content_moderator.moderate_content
         
-        return safety_checks
+        url_checks = [self.url_validator.validate_url(result.url) for result in results]
+        content_checks = [moderate(result.content) for result in results]
+        title_checks = [moderate(result.title) for result in results]
+        return url_checks, content_checks, title_checks
+    
+    def validate_search_results(self, results: List[SearchResult]) -> List[SafetyCheck]:
+        """Validate a list of search results (URL, content and title checks per result, in order)."""
+        return [
+            check
+            for checks in zip(*self.check_search_results(results))
+            for check in checks
+        ]
     
     def validate_final_output(self, content: str) -> SafetyCheck:
         """Validate final research output."""
@@ -3,11 +3,28 @@ State management for the Research Assistant Agent.
 Defines the state structure using TypedDict for type safety.
 """
 
+import hashlib
+import re
+from dataclasses import dataclass, field
 from typing import TypedDict, List, Dict, Any, Optional
 from pydantic import BaseModel
 
+# Characters dropped from the query when naming a report file
+REPORT_NAME_UNSAFE = re.compile(r"[^A-Za-z0-9 _-]")
 
-class SearchResult(BaseModel):
+
+def report_query_name(query: str) -> str:
+    """Get the query part of a report filename; shared by the CLI and the API."""
+    name = REPORT_NAME_UNSAFE.sub("", query[:50]).rstrip().replace(' ', '_')
+    
+    # Queries without ASCII letters or digits, e.g. in non-Latin scripts, leave nothing
+    if not name.strip("_-"):
+        return "query_" + hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+    return name
+
+
+@dataclass(slots=True)
+class SearchResult:
     """Individual search result structure."""
     url: str
     title: str
@@ -16,12 +33,13 @@ class SearchResult(BaseModel):
     raw_content: Optional[str] = None
 
 
-class SafetyCheck(BaseModel):
+@dataclass(slots=True)
+class SafetyCheck:
     """Safety validation result."""
     is_safe: bool
     reason: str
     confidence: float
-    flagged_content: List[str] = []
+    flagged_content: List[str] = field(default_factory=list)
 
 
 class ResearchState(TypedDict):
@@ -35,6 +53,10 @@ class ResearchState(TypedDict):
     sources: List[SearchResult]
     draft: str
     
+    # Search inputs: planned queries, and results for the raw query fetched while planning
+    search_queries: List[str]
+    speculative_sources: List[SearchResult]
+    
     # Safety and validation
     safety_checks: List[SafetyCheck]
     is_safe: bool
@@ -4,8 +4,12 @@ Handles Tavily search and Gemini LLM interactions.
 """
 
 import asyncio
-import json
-from typing import List, Dict, Any, Optional
+import functools
+import re
+import time
+from collections import OrderedDict
+import orjson
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 
@@ -14,32 +18,146 @@ from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
-from .config import Config
+from .config import Config, workflow_logger
 from .state import SearchResult, PlanningOutput, SynthesisOutput, ReflexionOutput
 from .safety import SafetyValidator
 
+# Plans kept for repeated queries; only plans parsed from a model response are cached
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_TTL_SECONDS = 3600
+
+# Most URLs Tavily's extract endpoint takes per call
+EXTRACT_BATCH_SIZE = 20
+
+# Body of the first ```json fenced block in a model response
+JSON_FENCE = re.compile(r"```json(.*?)```", re.DOTALL)
+
+# Plan text headings, checked in order; "search queries" etc. are covered by the shorter word
+PLAN_SECTIONS = (
+    ("research plan", "plan"),
+    ("queries", "queries"),
+    ("sources", "sources"),
+    ("criteria", "criteria"),
+)
+
+# Retry advice in a plain-text reflexion (retry, retrying, try again), not "should_retry" keys
+RETRY_HINT = re.compile(r"\bretry|\btry again", re.IGNORECASE)
+
+# Gemini prompts, filled in with %-formatting (the JSON braces need no escaping)
+PLAN_PROMPT = """
+        Create a comprehensive research plan for the following query: "%s"
+        
+        Provide your response in the following JSON format:
+        ```json
+        {
+            "research_plan": "Detailed step-by-step research approach",
+            "search_queries": ["query1", "query2", "query3"],
+            "expected_sources": ["source_type1", "source_type2"],
+            "success_criteria": "What constitutes successful research completion"
+        }
+        ```
+        
+        Focus on:
+        1. Breaking down the query into searchable components
+        2. Identifying reliable source types
+        3. Creating specific search queries
+        4. Defining clear success metrics
+        """
+
+SYNTHESIS_PROMPT = """
+        Synthesize research findings for the query: "%s"
+        
+        Based on the following sources:
+        %s
+        
+        Provide your response in JSON format:
+        ```json
+        {
+            "research_summary": "Comprehensive summary of findings",
+            "key_findings": ["finding1", "finding2", "finding3"],
+            "sources_used": ["source1", "source2"],
+            "confidence_level": 0.85,
+            "recommendations": ["recommendation1", "recommendation2"]
+        }
+        ```
+        
+        Requirements:
+        1. Synthesize information from multiple sources
+        2. Identify key findings and insights
+        3. Assess confidence level (0.0-1.0)
+        4. Provide actionable recommendations
+        5. Cite sources used
+        """
+
+REFLEXION_PROMPT = """
+        Analyze the failed research attempt and provide reflexion:
+        
+        Original Query: "%s"
+        Previous Attempt: "%s"
+        Error Context: "%s"
+        
+        Provide reflexion in JSON format:
+        ```json
+        {
+            "critique": "Analysis of what went wrong",
+            "identified_issues": ["issue1", "issue2"],
+            "improvement_suggestions": ["suggestion1", "suggestion2"],
+            "revised_plan": "Updated approach to address issues",
+            "should_retry": true/false
+        }
+        ```
+        
+        Focus on:
+        1. Identifying specific failure points
+        2. Understanding root causes
+        3. Proposing concrete improvements
+        4. Deciding if retry is worthwhile
+        """
+
 
 class StructuredOutputParser:
     """Parser for structured outputs from LLM responses."""
     
+    @staticmethod
+    def _parse_bare_json(text: str, model: type) -> Optional[BaseModel]:
+        """Parse a reply that is a bare JSON object (JSON mode); None if it isn't one or doesn't fit."""
+        if not text.lstrip().startswith("{"):
+            return None
+        try:
+            return model(**orjson.loads(text))
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def parse_planning_json(text: str) -> Optional[PlanningOutput]:
+        """Parse a planning reply holding JSON, bare or fenced; None if there is none that fits."""
+        parsed = StructuredOutputParser._parse_bare_json(text, PlanningOutput)
+        if parsed is not None:
+            return parsed
+        
+        match = JSON_FENCE.search(text)
+        if match:
+            try:
+                return PlanningOutput(**orjson.loads(match.group(1)))
+            except (TypeError, ValueError):
+                return None
+        return None
+    
     @staticmethod
     def parse_planning_output(text: str) -> PlanningOutput:
         """Parse planning output from LLM response."""
         try:
-            # Try to extract JSON if present
-            if "```json" in text:
-                json_start = text.find("```json") + 7
-                json_end = text.find("```", json_start)
-                json_text = text[json_start:json_end].strip()
-                data = json.loads(json_text)
-                return PlanningOutput(**data)
+            # Try to extract JSON if present, bare or fenced
+            parsed = StructuredOutputParser.parse_planning_json(text)
+            if parsed is not None:
+                return parsed
             
             # Fallback to text parsing
             lines = text.split('\n')
-            plan = ""
+            plan_lines = []
             queries = []
             sources = []
-            criteria = ""
+            criteria_lines = []
             
             current_section = None
             for line in lines:
@@ -47,15 +165,13 @@ class StructuredOutputParser:
                 if not line:
                     continue
                 
-                if "research plan" in line.lower():
-                    current_section = "plan"
-                elif "search queries" in line.lower() or "queries" in line.lower():
-                    current_section = "queries"
-                elif "expected sources" in line.lower() or "sources" in line.lower():
-                    current_section = "sources"
-                elif "success criteria" in line.lower() or "criteria" in line.lower():
-                    current_section = "criteria"
-                elif line.startswith('-') or line.startswith('*') or line.startswith('•'):
+                line_lower = line.lower()
+                heading = next(
+                    (section for keyword, section in PLAN_SECTIONS if keyword in line_lower), None
+                )
+                if heading:
+                    current_section = heading
+                elif line[0] in '-*•':
                     item = line[1:].strip()
                     if current_section == "queries":
                         queries.append(item)
@@ -63,15 +179,15 @@ class StructuredOutputParser:
                         sources.append(item)
                 else:
                     if current_section == "plan":
-                        plan += line + " "
+                        plan_lines.append(line)
                     elif current_section == "criteria":
-                        criteria += line + " "
+                        criteria_lines.append(line)
             
             return PlanningOutput(
-                research_plan=plan.strip() or "Comprehensive research plan",
+                research_plan=" ".join(plan_lines) or "Comprehensive research plan",
                 search_queries=queries or ["main research query"],
                 expected_sources=sources or ["academic sources", "news articles"],
-                success_criteria=criteria.strip() or "Accurate and comprehensive information"
+                success_criteria=" ".join(criteria_lines) or "Accurate and comprehensive information"
             )
             
         except Exception as e:
@@ -87,12 +203,14 @@ class StructuredOutputParser:
     def parse_synthesis_output(text: str) -> SynthesisOutput:
         """Parse synthesis output from LLM response."""
         try:
-            if "```json" in text:
-                json_start = text.find("```json") + 7
-                json_end = text.find("```", json_start)
-                json_text = text[json_start:json_end].strip()
-                data = json.loads(json_text)
-                return SynthesisOutput(**data)
+            # Try to extract JSON if present, bare or fenced
+            parsed = StructuredOutputParser._parse_bare_json(text, SynthesisOutput)
+            if parsed is not None:
+                return parsed
+            
+            match = JSON_FENCE.search(text)
+            if match:
+                return SynthesisOutput(**orjson.loads(match.group(1)))
             
             # Text parsing fallback
             return SynthesisOutput(
@@ -116,15 +234,17 @@ class StructuredOutputParser:
     def parse_reflexion_output(text: str) -> ReflexionOutput:
         """Parse reflexion output from LLM response."""
         try:
-            if "```json" in text:
-                json_start = text.find("```json") + 7
-                json_end = text.find("```", json_start)
-                json_text = text[json_start:json_end].strip()
-                data = json.loads(json_text)
-                return ReflexionOutput(**data)
+            # Try to extract JSON if present, bare or fenced
+            parsed = StructuredOutputParser._parse_bare_json(text, ReflexionOutput)
+            if parsed is not None:
+                return parsed
+            
+            match = JSON_FENCE.search(text)
+            if match:
+                return ReflexionOutput(**orjson.loads(match.group(1)))
             
             # Simple text parsing
-            should_retry = "retry" in text.lower() or "try again" in text.lower()
+            should_retry = RETRY_HINT.search(text) is not None
             
             return ReflexionOutput(
                 critique=text[:300] + "..." if len(text) > 300 else text,
@@ -144,12 +264,19 @@ class StructuredOutputParser:
             )
 
 
+@functools.lru_cache(maxsize=None)
+def _tavily_client(api_key: str) -> TavilyClient:
+    """One Tavily client, and so one pooled HTTP session, per API key."""
+    return TavilyClient(api_key)
+
+
 class TavilySearchTool:
     """Tavily search tool wrapper."""
     
     def __init__(self, api_key: str):
-        self.client = TavilyClient(api_key)
+        self.client = _tavily_client(api_key)
         self.safety_validator = SafetyValidator()
+        self._search_slots = asyncio.Semaphore(Config.MAX_CONCURRENT_SEARCHES)
     
     async def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
         """Perform search and return structured results."""
@@ -159,51 +286,68 @@ class TavilySearchTool:
                 wait_time = self.safety_validator.get_rate_limit_wait_time()
                 await asyncio.sleep(wait_time)
             
-            # Perform search
-            response = self.client.search(
-                query=query,
-                max_results=max_results,
-                include_raw_content=False
-            )
+            # Perform search; the client is synchronous, so run it on a worker thread
+            async with self._search_slots:
+                response = await asyncio.to_thread(
+                    self.client.search,
+                    query=query,
+                    max_results=max_results,
+                    include_raw_content=False
+                )
             
             # Convert to SearchResult objects
-            results = []
-            for item in response.get('results', []):
-                result = SearchResult(
+            return [
+                SearchResult(
                     url=item.get('url', ''),
                     title=item.get('title', ''),
                     content=item.get('content', ''),
                     score=item.get('score', 0.0),
                     raw_content=item.get('raw_content')
                 )
-                results.append(result)
-            
-            return results
+                for item in response.get('results', [])
+            ]
             
         except Exception as e:
-            print(f"Search error: {e}")
+            workflow_logger.error(f"Search error: {e}")
             return []
     
+    async def search_many(self, queries: List[str], max_results: int = 5) -> List[Any]:
+        """Run several searches concurrently; failures come back as exceptions in place."""
+        return await asyncio.gather(
+            *[self.search(query=query, max_results=max_results) for query in queries],
+            return_exceptions=True
+        )
+    
     async def extract_content(self, urls: List[str]) -> Dict[str, str]:
-        """Extract content from specific URLs."""
+        """Extract content from specific URLs, in concurrent batches Tavily accepts."""
+        content_maps = await asyncio.gather(*[
+            self._extract_batch(urls[i:i + EXTRACT_BATCH_SIZE])
+            for i in range(0, len(urls), EXTRACT_BATCH_SIZE)
+        ])
+        
+        content_map = {}
+        for batch_map in content_maps:
+            content_map.update(batch_map)
+        return content_map
+    
+    async def _extract_batch(self, urls: List[str]) -> Dict[str, str]:
+        """Extract content for one batch of URLs."""
         try:
             if not self.safety_validator.check_rate_limit():
                 wait_time = self.safety_validator.get_rate_limit_wait_time()
                 await asyncio.sleep(wait_time)
             
-            response = self.client.extract(urls=urls)
+            async with self._search_slots:
+                response = await asyncio.to_thread(self.client.extract, urls=urls)
             
-            content_map = {}
-            for result in response.get('results', []):
-                url = result.get('url', '')
-                content = result.get('raw_content', '')
-                if url and content:
-                    content_map[url] = content
-            
-            return content_map
+            return {
+                result['url']: result['raw_content']
+                for result in response.get('results', [])
+                if result.get('url') and result.get('raw_content')
+            }
             
         except Exception as e:
-            print(f"Content extraction error: {e}")
+            workflow_logger.error(f"Content extraction error: {e}")
             return {}
 
 
@@ -216,40 +360,53 @@ class GeminiLLM:
             max_output_tokens=Config.MAX_OUTPUT_TOKENS,
             temperature=Config.TEMPERATURE
         )
-    
-    async def generate_plan(self, query: str) -> PlanningOutput:
-        """Generate research plan."""
-        prompt = f"""
-        Create a comprehensive research plan for the following query: "{query}"
         
-        Provide your response in the following JSON format:
-        ```json
-        {{
-            "research_plan": "Detailed step-by-step research approach",
-            "search_queries": ["query1", "query2", "query3"],
-            "expected_sources": ["source_type1", "source_type2"],
-            "success_criteria": "What constitutes successful research completion"
-        }}
-        ```
+        # JSON mode per output model: the SDK validates the reply into response.parsed,
+        # and StructuredOutputParser only runs when that fails
+        self.plan_config = self._json_config(PlanningOutput)
+        self.synthesis_config = self._json_config(SynthesisOutput)
+        self.reflexion_config = self._json_config(ReflexionOutput)
         
-        Focus on:
-        1. Breaking down the query into searchable components
-        2. Identifying reliable source types
-        3. Creating specific search queries
-        4. Defining clear success metrics
-        """
+        # query -> (monotonic time cached, plan), oldest first
+        self._plan_cache: "OrderedDict[str, Tuple[float, PlanningOutput]]" = OrderedDict()
+    
+    def _json_config(self, schema: type) -> types.GenerateContentConfig:
+        """Copy the base config, asking for JSON matching schema."""
+        return self.config.model_copy(update={
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+        })
+    
+    async def generate_plan(self, query: str, use_cache: bool = True) -> PlanningOutput:
+        """Generate research plan, reusing a recent plan for the same query if use_cache."""
+        cached = self._plan_cache.get(query) if use_cache else None
+        if cached is not None and time.monotonic() - cached[0] < PLAN_CACHE_TTL_SECONDS:
+            self._plan_cache.move_to_end(query)
+            return cached[1]
+        
+        prompt = PLAN_PROMPT % (query,)
         
         try:
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=Config.GEMINI_MODEL,
-                config=self.config,
+                config=self.plan_config,
                 contents=[prompt]
             )
             
-            return StructuredOutputParser.parse_planning_output(response.text)
+            planning_output = response.parsed or StructuredOutputParser.parse_planning_json(response.text or "")
+            if planning_output is None:
+                # Text and placeholder plans are not cached, so one malformed reply
+                # is not served for every repeat of the query until the TTL expires
+                return StructuredOutputParser.parse_planning_output(response.text or "")
+            
+            self._plan_cache[query] = (time.monotonic(), planning_output)
+            self._plan_cache.move_to_end(query)
+            if len(self._plan_cache) > PLAN_CACHE_SIZE:
+                self._plan_cache.popitem(last=False)
+            return planning_output
             
         except Exception as e:
-            print(f"Planning generation error: {e}")
+            workflow_logger.error(f"Planning generation error: {e}")
             return PlanningOutput(
                 research_plan=f"Research plan for: {query}",
                 search_queries=[query],
@@ -264,42 +421,19 @@ class GeminiLLM:
             for s in sources[:5]  # Limit to top 5 sources
         ])
         
-        prompt = f"""
-        Synthesize research findings for the query: "{query}"
-        
-        Based on the following sources:
-        {sources_text}
-        
-        Provide your response in JSON format:
-        ```json
-        {{
-            "research_summary": "Comprehensive summary of findings",
-            "key_findings": ["finding1", "finding2", "finding3"],
-            "sources_used": ["source1", "source2"],
-            "confidence_level": 0.85,
-            "recommendations": ["recommendation1", "recommendation2"]
-        }}
-        ```
-        
-        Requirements:
-        1. Synthesize information from multiple sources
-        2. Identify key findings and insights
-        3. Assess confidence level (0.0-1.0)
-        4. Provide actionable recommendations
-        5. Cite sources used
-        """
+        prompt = SYNTHESIS_PROMPT % (query, sources_text)
         
         try:
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=Config.GEMINI_MODEL,
-                config=self.config,
+                config=self.synthesis_config,
                 contents=[prompt]
             )
             
-            return StructuredOutputParser.parse_synthesis_output(response.text)
+            return response.parsed or StructuredOutputParser.parse_synthesis_output(response.text)
             
         except Exception as e:
-            print(f"Synthesis error: {e}")
+            workflow_logger.error(f"Synthesis error: {e}")
             return SynthesisOutput(
                 research_summary="Research synthesis completed",
                 key_findings=["Key insights gathered"],
@@ -310,42 +444,19 @@ class GeminiLLM:
     
     async def perform_reflexion(self, query: str, previous_attempt: str, error_context: str) -> ReflexionOutput:
         """Perform reflexion on failed attempt."""
-        prompt = f"""
-        Analyze the failed research attempt and provide reflexion:
-        
-        Original Query: "{query}"
-        Previous Attempt: "{previous_attempt}"
-        Error Context: "{error_context}"
-        
-        Provide reflexion in JSON format:
-        ```json
-        {{
-            "critique": "Analysis of what went wrong",
-            "identified_issues": ["issue1", "issue2"],
-            "improvement_suggestions": ["suggestion1", "suggestion2"],
-            "revised_plan": "Updated approach to address issues",
-            "should_retry": true/false
-        }}
-        ```
-        
-        Focus on:
-        1. Identifying specific failure points
-        2. Understanding root causes
-        3. Proposing concrete improvements
-        4. Deciding if retry is worthwhile
-        """
+        prompt = REFLEXION_PROMPT % (query, previous_attempt, error_context)
         
         try:
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=Config.GEMINI_MODEL,
-                config=self.config,
+                config=self.reflexion_config,
                 contents=[prompt]
             )
             
-            return StructuredOutputParser.parse_reflexion_output(response.text)
+            return response.parsed or StructuredOutputParser.parse_reflexion_output(response.text)
             
         except Exception as e:
-            print(f"Reflexion error: {e}")
+            workflow_logger.error(f"Reflexion error: {e}")
             return ReflexionOutput(
                 critique="Analysis of previous attempt",
                 identified_issues=["General issues encountered"],
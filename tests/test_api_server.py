@@ -0,0 +1,439 @@
+"""
+Tests for the Research Assistant API.
+Tests request validation, authentication, audit logging and storage.
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# Add project root to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Keep the API's users, audit and research files out of the working tree
+_DATA_DIR = tempfile.mkdtemp(prefix="research_api_test_")
+os.environ["USERS_FILE"] = os.path.join(_DATA_DIR, "users.json")
+os.environ["AUDIT_LOG_DIR"] = os.path.join(_DATA_DIR, "audit")
+os.environ["RESEARCH_STORAGE_DIR"] = os.path.join(_DATA_DIR, "research")
+
+import orjson
+from fastapi.testclient import TestClient
+from jose import JWTError, jwt, jws
+
+from api import auth
+from api.auth import AuthManager, UserCreate, SECRET_KEY, _decode_hs256
+from api.audit import AuditLogger, user_storage_name
+from api.main import app
+from api.models import ResearchStatus
+from api.research_manager import ResearchManager, _read_request_cached, _request_file_cache
+
+
+@pytest.fixture(scope="module")
+def client():
+    """API test client."""
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def auth_headers(client):
+    """Authorization headers of a registered test user."""
+    client.post("/auth/register", json={
+        "username": "pager",
+        "email": "pager@example.com",
+        "full_name": "Pager",
+        "password": "pagerpassword"
+    })
+    response = client.post("/auth/login", json={"username": "pager", "password": "pagerpassword"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestPagination:
+    """Test pagination parameters of the list endpoints."""
+    
+    @pytest.mark.parametrize("path", ["/audit", "/research"])
+    @pytest.mark.parametrize("query", ["page=0", "page=-1", "per_page=0", "per_page=-5", "per_page=101"])
+    def test_invalid_pagination_rejected(self, client, auth_headers, path, query):
+        """Test that out-of-range pages are rejected before any body is sent."""
+        response = client.get(f"{path}?{query}", headers=auth_headers)
+        assert response.status_code == 422
+    
+    @pytest.mark.parametrize("path", ["/audit", "/research"])
+    def test_valid_pagination(self, client, auth_headers, path):
+        """Test that a valid page returns a complete JSON body."""
+        response = client.get(f"{path}?page=2&per_page=5", headers=auth_headers)
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["page"] == 2
+        assert data["per_page"] == 5
+        assert isinstance(data["total"], int)
+    
+    def test_research_list_has_content_length(self, client, auth_headers):
+        """Test that the in-memory research list is sent as one sized body."""
+        response = client.get("/research", headers=auth_headers)
+        assert response.status_code == 200
+        assert int(response.headers["content-length"]) == len(response.content)
+        assert response.json()["items"] == []
+
+
+class TestLongPoll:
+    """Test the research long-poll endpoint."""
+    
+    @pytest.mark.parametrize("timeout", ["nan", "inf", "-1", "61"])
+    def test_invalid_wait_timeout_rejected(self, client, auth_headers, timeout):
+        """Test that the long-poll timeout is bounded before anything waits on it."""
+        response = client.get(f"/research/{'0' * 32}/wait?timeout={timeout}", headers=auth_headers)
+        assert response.status_code == 422
+
+
+class TestUserStorage:
+    """Test the users file shared by API workers."""
+    
+    def test_flush_keeps_users_saved_by_other_workers(self, tmp_path, monkeypatch):
+        """Test that a pending last_login write does not drop another worker's user."""
+        monkeypatch.setattr(auth, "USERS_FILE", str(tmp_path / "users.json"))
+        worker_a, worker_b = AuthManager(), AuthManager()
+        
+        async def scenario():
+            await worker_a.create_user(UserCreate(
+                username="alice", email="alice@example.com", full_name="Alice", password="pw-alice"
+            ))
+            await worker_a.start()
+            try:
+                # Login is held back by worker A while worker B registers a user
+                assert await worker_a.authenticate_user("alice", "pw-alice") is not None
+                await worker_b.create_user(UserCreate(
+                    username="bob", email="bob@example.com", full_name="Bob", password="pw-bob"
+                ))
+            finally:
+                await worker_a.stop()
+        
+        asyncio.run(scenario())
+        
+        reader = AuthManager()
+        assert reader.get_user("bob") is not None
+        assert reader.get_user("alice").last_login is not None
+
+
+
+class TestAuditLog:
+    """Test per-user audit log files."""
+    
+    def test_user_storage_names_do_not_collide(self):
+        """Test that no username can claim another user's storage name."""
+        hashed = user_storage_name("bob@example.com")
+        assert hashed.startswith("_")
+        assert user_storage_name(hashed) != hashed
+        assert user_storage_name("bob") == "bob"
+        assert user_storage_name("Bob") != user_storage_name("bob")
+        assert user_storage_name("..") != ".."
+    
+    def test_hashed_name_does_not_read_other_users_log(self, tmp_path):
+        """Test that registering a hashed storage name exposes nothing."""
+        logger = AuditLogger(log_dir=str(tmp_path))
+        logger.log_user_registration("bob@example.com", "bob@example.com", "127.0.0.1")
+        
+        assert len(logger.get_recent_logs(username="bob@example.com")) == 1
+        assert logger.get_recent_logs(username=user_storage_name("bob@example.com")) == []
+    
+    def test_unknown_users_get_no_directory(self, tmp_path):
+        """Test that failed logins for unknown usernames only reach the global log."""
+        logger = AuditLogger(log_dir=str(tmp_path))
+        logger.log_auth_failure("nobody", "127.0.0.1", "pytest", "Invalid credentials", user_exists=False)
+        
+        assert [p for p in (tmp_path / "by_user").iterdir() if p.is_dir()] == []
+        assert len(logger.get_recent_logs()) == 1
+    
+    def test_entries_before_per_user_files_are_still_listed(self, tmp_path):
+        """Test that a user's entries from before the per-user files come from the global log."""
+        legacy = [{"timestamp": f"2026-01-0{i}T10:00:00", "level": "info", "action": "login",
+                   "username": "alice" if i % 2 else "bob", "ip_address": None, "user_agent": None,
+                   "details": {}, "request_id": None, "duration_ms": None} for i in range(1, 5)]
+        now = datetime.now()
+        (tmp_path / f"audit_{now.strftime('%Y%m%d')}.log").write_bytes(
+            b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in legacy)
+        )
+        
+        logger = AuditLogger(log_dir=str(tmp_path))
+        logger.log_auth_success("alice", "127.0.0.1", "pytest")
+        
+        logs = logger.get_recent_logs(username="alice")
+        assert [entry["timestamp"] for entry in logs[1:]] == ["2026-01-03T10:00:00", "2026-01-01T10:00:00"]
+        assert logs[0]["action"] == "login" and logs[0]["timestamp"] > "2026-01-04"
+        assert logger.count_recent_logs(username="alice") == 3
+        
+        # A second worker agrees on when the per-user files start and lists nothing twice
+        other = AuditLogger(log_dir=str(tmp_path))
+        assert other._per_user_since == logger._per_user_since
+        assert len(other.get_recent_logs(username="alice")) == 3
+    
+    def _msgpack_logger(self, tmp_path, entries: int) -> AuditLogger:
+        """Create a msgpack audit logger with ``entries`` logged entries."""
+        logger = AuditLogger(log_dir=str(tmp_path), log_format="msgpack")
+        for i in range(entries):
+            logger.log_research_start("carol", f"query {i}", f"req-{i}", "127.0.0.1")
+        return logger
+    
+    def test_msgpack_records_match_json_lines(self, tmp_path):
+        """Test that binary records read back exactly like the per-user JSON lines."""
+        logger = self._msgpack_logger(tmp_path, 5)
+        
+        assert logger.get_recent_logs() == logger.get_recent_logs(username="carol")
+        assert logger.count_recent_logs() == 5
+    
+    def test_msgpack_torn_tail_keeps_earlier_records(self, tmp_path):
+        """Test that a record cut off mid-write only loses that record."""
+        logger = self._msgpack_logger(tmp_path, 5)
+        log_file = logger._get_log_file()
+        data = log_file.read_bytes()
+        log_file.write_bytes(data + data[:-1][-30:])
+        
+        logs = logger.get_recent_logs()
+        assert [entry["request_id"] for entry in logs] == [f"req-{i}" for i in reversed(range(5))]
+        assert logger.count_recent_logs() == 5
+    
+    def test_msgpack_damaged_record_is_skipped(self, tmp_path):
+        """Test that records written after a damaged one are still read."""
+        logger = self._msgpack_logger(tmp_path, 3)
+        log_file = logger._get_log_file()
+        with open(log_file, 'ab') as f:
+            f.write(log_file.read_bytes()[:20])
+        logger.close()
+        for i in range(3, 6):
+            logger.log_research_start("carol", f"query {i}", f"req-{i}", "127.0.0.1")
+        
+        logs = logger.get_recent_logs()
+        assert [entry["request_id"] for entry in logs] == [f"req-{i}" for i in reversed(range(6))]
+    
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 65536])
+    @pytest.mark.parametrize("trailing_newline", [True, False])
+    def test_lines_read_in_reverse(self, tmp_path, chunk_size, trailing_newline):
+        """Test reading lines back to front across chunk boundaries."""
+        lines = [b'{"n":%d,"pad":"%s"}' % (i, b"x" * (i * 13 % 50)) for i in range(40)]
+        log_file = tmp_path / "audit.log"
+        log_file.write_bytes(b"\n".join(lines) + (b"\n" if trailing_newline else b""))
+        
+        logger = AuditLogger(log_dir=str(tmp_path / "audit"))
+        assert list(logger._read_lines_reversed(log_file, chunk_size=chunk_size)) == lines[::-1]
+    
+    def test_empty_log_reads_nothing(self, tmp_path):
+        """Test reading an empty log file."""
+        log_file = tmp_path / "audit.log"
+        log_file.write_bytes(b"")
+        
+        logger = AuditLogger(log_dir=str(tmp_path / "audit"))
+        assert list(logger._read_lines_reversed(log_file)) == []
+
+
+def _jose_claims(token: str):
+    """Decode a token with jose, the reference verifier."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return "rejected"
+
+
+def _fast_path_claims(token: str):
+    """Decode a token with the standard library HS256 verifier."""
+    try:
+        return _decode_hs256(token)
+    except JWTError:
+        return "rejected"
+
+
+class TestTokenVerification:
+    """Test JWT verification."""
+    
+    @pytest.mark.parametrize("token_factory", [
+        pytest.param(lambda: jwt.encode({"sub": "alice", "exp": time.time() + 60}, SECRET_KEY, "HS256"), id="valid"),
+        pytest.param(lambda: jwt.encode({"sub": "alice"}, SECRET_KEY, "HS256"), id="no-exp"),
+        pytest.param(lambda: jwt.encode({"sub": "alice", "exp": time.time() + 60}, "other-key", "HS256"), id="bad-signature"),
+        pytest.param(lambda: jwt.encode({"sub": "alice", "exp": time.time() + 60}, SECRET_KEY, "HS512"), id="hs512"),
+        pytest.param(lambda: jwt.encode({"sub": "alice", "exp": time.time() - 60}, SECRET_KEY, "HS256"), id="expired"),
+        pytest.param(lambda: jwt.encode({"sub": "alice", "nbf": time.time() + 60}, SECRET_KEY, "HS256"), id="not-yet-valid"),
+        pytest.param(lambda: jws.sign(b"[1, 2]", SECRET_KEY, algorithm="HS256"), id="array-payload"),
+        pytest.param(lambda: jws.sign(b"not json", SECRET_KEY, algorithm="HS256"), id="text-payload"),
+        pytest.param(lambda: "eyJhbGciOiJub25lIiwidHlwIjoiSldUIn0.eyJzdWIiOiJhbGljZSJ9.", id="alg-none"),
+        pytest.param(lambda: "not-a-token", id="one-segment"),
+        pytest.param(lambda: "a.b", id="two-segments"),
+        pytest.param(lambda: "a.b.c.d", id="four-segments"),
+        pytest.param(lambda: "!!!.***.###", id="bad-base64"),
+        pytest.param(lambda: "", id="empty"),
+    ])
+    def test_matches_jose(self, token_factory):
+        """Test that the fast path accepts and rejects the same tokens as jose."""
+        token = token_factory()
+        claims = _jose_claims(token)
+        
+        assert _fast_path_claims(token) == claims
+    
+    def test_tampered_payload_rejected(self):
+        """Test that changing the claims invalidates the signature."""
+        header, _, signature = jwt.encode({"sub": "alice"}, SECRET_KEY, "HS256").split(".")
+        _, payload, _ = jwt.encode({"sub": "mallory"}, SECRET_KEY, "HS256").split(".")
+        
+        assert _fast_path_claims(f"{header}.{payload}.{signature}") == "rejected"
+    
+    def test_verify_token_cache(self):
+        """Test that cached tokens keep their username and never outlive their expiry."""
+        manager = AuthManager()
+        exp = time.time() + 2
+        token = jwt.encode({"sub": "alice", "exp": exp}, SECRET_KEY, "HS256")
+        
+        assert manager.verify_token(token) == "alice"
+        assert manager.verify_token(token) == "alice"
+        assert manager._token_cache[token][1] <= exp
+        assert manager.verify_token(token[:-2] + "xx") is None
+        
+        expired = jwt.encode({"sub": "alice", "exp": time.time() - 1}, SECRET_KEY, "HS256")
+        assert manager.verify_token(expired) is None
+        assert expired not in manager._token_cache
+
+
+class TestResearchManager:
+    """Test research request storage helpers."""
+    
+    @pytest.mark.parametrize("draft, confidence", [
+        ("", 0.0),
+        ("No score here.", 0.8),
+        ("Confidence Level: 0.85 (out of 1.0)", 0.85),
+        ("## Confidence Level\n0.7 (out of 1.0)", 0.7),
+        ("**Confidence level:** 1", 1.0),
+        ("Confidence Level: 85", 0.8),
+        ("Confidence Level\n\nunrelated 0.5", 0.8),
+    ])
+    def test_extract_confidence(self, tmp_path, draft, confidence):
+        """Test reading the confidence level from a report draft."""
+        manager = ResearchManager(storage_dir=str(tmp_path))
+        assert manager._extract_confidence(draft) == confidence
+    
+    def test_hashed_name_does_not_list_other_users_requests(self, tmp_path):
+        """Test that registering a hashed storage name exposes no research index."""
+        manager = ResearchManager(storage_dir=str(tmp_path))
+        
+        async def scenario():
+            await manager.create_request("private query", "bob@example.com", save_report=False)
+            own = await manager.get_user_requests("bob@example.com")
+            other = await manager.get_user_requests(user_storage_name("bob@example.com"))
+            return own, other
+        
+        (own, own_total), (other, other_total) = asyncio.run(scenario())
+        assert own_total == 1 and own[0]["query"] == "private query"
+        assert other_total == 0 and other == []
+    
+    def test_loaded_requests_are_not_shared(self, tmp_path):
+        """Test that changing a loaded request does not leak into the next load."""
+        manager = ResearchManager(storage_dir=str(tmp_path))
+        
+        async def scenario():
+            request_id = await manager.create_request("private query", "bob@example.com", save_report=False)
+            first = await manager._load_request(request_id)
+            first["status"] = "tampered"
+            first["errors"].append("tampered")
+            return await manager._load_request(request_id)
+        
+        second = asyncio.run(scenario())
+        assert second["status"] != "tampered"
+        assert "tampered" not in second["errors"]
+    
+    def test_stats_include_requests_saved_by_other_workers(self, tmp_path):
+        """Test that request counts follow the shared index, not a per-process snapshot."""
+        first = ResearchManager(storage_dir=str(tmp_path))
+        second = ResearchManager(storage_dir=str(tmp_path))
+        
+        async def scenario():
+            await first.create_request("query one", "bob", save_report=False)
+            before = await first.get_user_stats("bob")
+            request_id = await second.create_request("query two", "bob", save_report=False)
+            request_data = await second.get_request(request_id)
+            request_data["status"] = ResearchStatus.FAILED
+            await second._save_request(request_id, request_data)
+            return before, await first.get_user_stats("bob")
+        
+        before, after = asyncio.run(scenario())
+        assert before == (1, 0, 0)
+        assert after == (2, 0, 1)
+    
+    def test_index_built_once_by_concurrent_workers(self, tmp_path):
+        """Test that two workers building the index together write each row once."""
+        seed = ResearchManager(storage_dir=str(tmp_path))
+        request_ids = [asyncio.run(seed.create_request(f"query {i}", "bob", save_report=False)) for i in range(5)]
+        for index_file in (tmp_path / "_index").iterdir():
+            index_file.unlink()
+        
+        workers = [ResearchManager(storage_dir=str(tmp_path)) for _ in range(2)]
+        
+        async def build():
+            await asyncio.gather(*[worker._ensure_index() for worker in workers])
+        
+        asyncio.run(build())
+        rows = (tmp_path / "_index" / "bob.jsonl").read_bytes().splitlines()
+        assert [orjson.loads(row)["request_id"] for row in rows] == request_ids
+        assert not (tmp_path / "_index" / ".build.lock").exists()
+    
+    def test_index_compacted_once_mostly_superseded(self, tmp_path, monkeypatch):
+        """Test that superseded index rows are dropped without changing what is listed."""
+        monkeypatch.setattr("api.research_manager.INDEX_COMPACT_MIN_ROWS", 4)
+        manager = ResearchManager(storage_dir=str(tmp_path))
+        index_file = tmp_path / "_index" / "bob.jsonl"
+        
+        async def scenario():
+            request_id = await manager.create_request("query", "bob", save_report=False)
+            request_data = await manager.get_request(request_id)
+            for status in [ResearchStatus.RUNNING] * 5 + [ResearchStatus.COMPLETED]:
+                request_data["status"] = status
+                await manager._save_request(request_id, request_data)
+            rows_before = len(index_file.read_bytes().splitlines())
+            listed = await manager.get_user_requests("bob")
+            return rows_before, listed, await manager.get_user_requests("bob")
+        
+        rows_before, listed, relisted = asyncio.run(scenario())
+        assert rows_before >= 7
+        assert len(index_file.read_bytes().splitlines()) == 1
+        assert listed == relisted
+        assert listed[1] == 1 and listed[0][0]["status"] == ResearchStatus.COMPLETED
+    
+    def test_request_file_rewritten_within_one_mtime_tick_is_reread(self, tmp_path):
+        """Test that the request file cache notices a same-size rewrite with an unchanged mtime."""
+        request_file = tmp_path / "request.json"
+        ResearchManager._write_atomic(request_file, b'{"status":"pending"}')
+        mtime_ns = request_file.stat().st_mtime_ns
+        assert _read_request_cached(str(request_file)) == b'{"status":"pending"}'
+        
+        ResearchManager._write_atomic(request_file, b'{"status":"running"}')
+        os.utime(request_file, ns=(mtime_ns, mtime_ns))
+        assert _read_request_cached(str(request_file)) == b'{"status":"running"}'
+        assert sum(1 for path in _request_file_cache if path == str(request_file)) == 1
+    
+    def test_response_model_never_lags_request_data(self, tmp_path):
+        """Test that readers during a save never get the model of the previous state."""
+        manager = ResearchManager(storage_dir=str(tmp_path))
+        
+        class FakeWorkflow:
+            async def run_research(self, query, thread_id=None):
+                return {"draft": "Confidence Level: 0.9", "sources": [], "is_safe": True}
+        
+        manager._workflow = FakeWorkflow()
+        seen = []
+        save_request = manager._save_request
+        
+        async def spy(request_id, data):
+            seen.append((data["status"], manager.to_response_model(data).status))
+            await save_request(request_id, data)
+        
+        manager._save_request = spy
+        
+        async def scenario():
+            request_id = await manager.create_request("query", "bob", save_report=False)
+            manager.to_response_model(await manager.get_request(request_id))
+            await manager.start_research(request_id)
+            return await manager.wait_for_request(request_id, timeout=5)
+        
+        assert asyncio.run(scenario())["status"] == ResearchStatus.COMPLETED
+        assert [status for status, _ in seen] == [ResearchStatus.PENDING, ResearchStatus.RUNNING, ResearchStatus.COMPLETED]
+        assert all(status == model_status for status, model_status in seen)
@@ -7,15 +7,17 @@ import pytest
 import asyncio
 import sys
 import os
+from unittest import mock
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.state import ResearchState, SearchResult, SafetyCheck
+from src.state import ResearchState, SearchResult, SafetyCheck, PlanningOutput, report_query_name
 from src.config import Config
 from src.safety import URLValidator, ContentModerationChain, SafetyValidator
-from src.nodes import create_initial_state
-from src.tools import StructuredOutputParser
+from src.nodes import ResearchNodes, create_initial_state
+from src.tools import StructuredOutputParser, GeminiLLM
+from src.graph import ROUTES, ResearchWorkflow, _checkpoint_serde
 
 
 class TestStateManagement:
@@ -65,6 +67,18 @@ class TestStateManagement:
         assert check.reason == "Content passed validation"
         assert check.confidence == 0.9
         assert check.flagged_content == []
+    
+    def test_report_query_name(self):
+        """Test the query part of report filenames."""
+        assert report_query_name("What is AI? (2024)") == "What_is_AI_2024"
+        assert report_query_name("x" * 80) == "x" * 50
+        
+        # Nothing usable is left of non-ASCII queries, so different queries get different hashes
+        first = report_query_name("量子计算是什么")
+        second = report_query_name("Что такое ИИ?")
+        assert first.startswith("query_") and second.startswith("query_")
+        assert first != second
+        assert report_query_name("量子计算是什么") == first
 
 
 class TestSafetyValidation:
@@ -118,6 +132,20 @@ class TestSafetyValidation:
         assert "violence" in check.flagged_content
         assert "hate" in check.flagged_content
     
+    def test_content_moderation_cache_returns_copies(self):
+        """Test that repeated moderation does not hand out a shared result."""
+        moderator = ContentModerationChain(["violence"])
+        content = "This content contains violence."
+        
+        first = moderator.moderate_content(content)
+        first.flagged_content.append("extra")
+        first.is_safe = True
+        
+        second = moderator.moderate_content(content)
+        assert second is not first
+        assert second.is_safe == False
+        assert second.flagged_content == ContentModerationChain(["violence"]).moderate_content(content).flagged_content
+    
     def test_safety_validator_aggregation(self):
         """Test safety check aggregation."""
         validator = SafetyValidator()
@@ -209,6 +237,71 @@ class TestStructuredOutputParser:
         assert result.should_retry == True  # Contains "retry"
         assert isinstance(result.identified_issues, list)
         assert isinstance(result.improvement_suggestions, list)
+    
+    def test_only_structured_plans_are_cached(self):
+        """Test that fallback plans from malformed replies are never reused."""
+        replies = ["not a plan at all", '{"research_plan": "Plan", "search_queries": ["q1"], '
+                   '"expected_sources": ["web"], "success_criteria": "Done"}']
+        calls = []
+        
+        class FakeModels:
+            async def generate_content(self, **kwargs):
+                calls.append(kwargs)
+                return mock.Mock(parsed=None, text=replies[min(len(calls), len(replies)) - 1])
+        
+        llm = GeminiLLM("test-key")
+        llm.client = mock.Mock()
+        llm.client.aio.models = FakeModels()
+        
+        fallback = asyncio.run(llm.generate_plan("topic"))
+        assert fallback.search_queries == ["main research query"]
+        assert "topic" not in llm._plan_cache
+        
+        plan = asyncio.run(llm.generate_plan("topic"))
+        assert plan.search_queries == ["q1"]
+        assert asyncio.run(llm.generate_plan("topic")) is plan
+        assert len(calls) == 2
+
+
+class TestWorkflowNodes:
+    """Test individual workflow nodes with stubbed clients."""
+    
+    def _nodes(self, search):
+        """Build nodes whose LLM returns a fixed plan and whose search runs ``search``."""
+        nodes = ResearchNodes()
+        nodes.llm = mock.Mock()
+        nodes.llm.generate_plan = mock.AsyncMock(return_value=PlanningOutput(
+            research_plan="Plan", search_queries=["q1"],
+            expected_sources=["web"], success_criteria="Done"
+        ))
+        nodes.search_tool = mock.Mock()
+        nodes.search_tool.search = mock.AsyncMock(side_effect=search)
+        return nodes
+    
+    def test_plan_node_searches_raw_query_on_first_attempt_only(self):
+        """Test that only the first plan starts the speculative raw-query search."""
+        result = SearchResult(url="https://example.com", title="T", content="C", score=0.5)
+        nodes = self._nodes(lambda **kwargs: [result])
+        
+        state = asyncio.run(nodes.plan_node(create_initial_state("topic")))
+        assert state['speculative_sources'] == [result]
+        
+        retry = create_initial_state("topic")
+        retry['retry_count'] = 1
+        state = asyncio.run(nodes.plan_node(retry))
+        assert state['speculative_sources'] == []
+        assert state['current_step'] == 'planning_complete'
+        assert nodes.search_tool.search.await_count == 1
+    
+    def test_plan_node_keeps_plan_when_speculative_search_fails(self):
+        """Test that a failed raw-query search does not discard a good plan."""
+        def search(**kwargs):
+            raise RuntimeError("search unavailable")
+        
+        state = asyncio.run(self._nodes(search).plan_node(create_initial_state("topic")))
+        assert state['current_step'] == 'planning_complete'
+        assert state['search_queries'] == ["q1"]
+        assert state['speculative_sources'] == []
 
 
 class TestConfiguration:
@@ -249,6 +342,83 @@ class TestConfiguration:
         assert "hate" in Config.BLOCKED_KEYWORDS
 
 
+def _reference_route(node: str, state: dict) -> str:
+    """Routing of the original per-node router functions, kept as the reference for ROUTES."""
+    current_step = state.get('current_step', '')
+    can_retry = state['retry_count'] < state['max_retries']
+    
+    if node == "plan":
+        if current_step == 'planning_complete':
+            return "search"
+        return "reflexion" if current_step == 'planning_failed' and can_retry else "end"
+    
+    if node in ("search", "validate"):
+        success, failure, next_node = {
+            "search": ('search_complete', 'search_failed', "validate"),
+            "validate": ('validation_complete', 'validation_failed', "synthesize"),
+        }[node]
+        if current_step == success:
+            if state.get('sources', []):
+                return next_node
+            return "reflexion" if can_retry else "end"
+        return "reflexion" if current_step == failure and can_retry else "end"
+    
+    if node == "synthesize":
+        if current_step == 'synthesis_complete':
+            return "safety"
+        return "reflexion" if current_step == 'synthesis_failed' and can_retry else "end"
+    
+    if node == "safety":
+        is_safe = state.get('is_safe', False)
+        if current_step == 'completed' and is_safe:
+            return "end"
+        if current_step in ['safety_failed', 'safety_validation_failed'] or not is_safe:
+            return "reflexion" if can_retry else "end"
+        return "end"
+    
+    return "plan" if current_step == 'retry_planning' else "end"
+
+
+class TestWorkflowRouting:
+    """Test routing between workflow nodes."""
+    
+    STEPS = [
+        "", "initialized", "planning_complete", "planning_failed", "search_complete",
+        "search_failed", "validation_complete", "validation_failed", "synthesis_complete",
+        "synthesis_failed", "completed", "safety_failed", "safety_validation_failed",
+        "retry_planning", "reflexion_failed", "max_retries_reached"
+    ]
+    
+    def test_routes_match_reference_routers(self):
+        """Test that the ROUTES table routes every state like the original routers."""
+        workflow = ResearchWorkflow()
+        
+        for node, route in ROUTES.items():
+            for step in self.STEPS:
+                for sources in ([], [object()]):
+                    for is_safe in (True, False, None):
+                        for retry_count in (0, 3):
+                            state = {
+                                'current_step': step,
+                                'sources': sources,
+                                'retry_count': retry_count,
+                                'max_retries': 3
+                            }
+                            if is_safe is not None:
+                                state['is_safe'] = is_safe
+                            
+                            assert workflow._route(route, state) == _reference_route(node, state), (node, state)
+    
+    def test_checkpoint_serde_on_older_langgraph(self):
+        """Test that a serializer without allowed_msgpack_modules still builds."""
+        class LegacySerializer:
+            def __init__(self, *, pickle_fallback: bool = False):
+                self.pickle_fallback = pickle_fallback
+        
+        with mock.patch("src.graph.JsonPlusSerializer", LegacySerializer):
+            assert isinstance(_checkpoint_serde(), LegacySerializer)
+
+
 # Async test runner
 def run_async_test(coro):
     """Helper to run async tests."""
@@ -264,7 +434,9 @@ if __name__ == "__main__":
         TestStateManagement,
         TestSafetyValidation,
         TestStructuredOutputParser,
-        TestConfiguration
+        TestWorkflowNodes,
+        TestConfiguration,
+        TestWorkflowRouting
     ]
     
     total_tests = 0